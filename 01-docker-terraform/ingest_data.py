@@ -2,94 +2,1273 @@
 # coding: utf-8
 
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sqlalchemy import create_engine
 from tqdm.auto import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import argparse
+import collections
+import datetime
+import functools
+import io
+import itertools
 import os
+import queue
+import re
+import shutil
+import struct
 import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Declared TLC column types and the download cache from /shared at the repo
+# root. The cache is optional, so the script still runs with only
+# tlc_schemas.py next to it (e.g. in a slim Docker image).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from tlc_schemas import TAXI_SCHEMAS, arrow_types
+try:
+    from tlc_cache import DownloadCache
+except ImportError:
+    DownloadCache = None
+
+# insert      -> DataFrame.to_sql (row-by-row INSERTs, slowest but driver-agnostic)
+# copy-csv    -> COPY ... FROM STDIN with a CSV buffer built by pandas
+# copy-binary -> COPY ... FROM STDIN with a PGCOPY binary buffer built by numpy
+LOAD_METHODS = ['insert', 'copy-csv', 'copy-binary']
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+COPY_BLOCK_SIZE = 1024 * 1024
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+# NULL marker for CSV COPY, so empty strings load as '' (as with to_sql)
+# rather than as NULL, COPY's default for an empty unquoted field
+CSV_NULL = r'\N'
+
+
+# ─────────────────────────────────────────────
+# SCHEMA REGISTRY
+# Declared column types per taxi type (TAXI_SCHEMAS, shared/tlc_schemas.py),
+# so readers never have to infer them. Each logical type maps to the pandas
+# dtype the readers produce and the Arrow type Parquet batches are cast to;
+# the Postgres column type then follows from the pandas dtype when the table
+# is created (Int16 → SMALLINT, Int32 → INTEGER, float64 → DOUBLE PRECISION,
+# datetime64 → TIMESTAMP). Column names are matched case-insensitively, since
+# TLC has changed the casing between releases (e.g. Airport_fee / airport_fee).
+# ─────────────────────────────────────────────
+_ARROW_TYPES = arrow_types(text=pa.large_string())
+
+COLUMN_TYPES = {
+    'smallint':  ('Int16', _ARROW_TYPES['smallint']),
+    'integer':   ('Int32', _ARROW_TYPES['integer']),
+    'double':    ('float64', _ARROW_TYPES['double']),
+    'timestamp': ('datetime64[us]', _ARROW_TYPES['timestamp']),
+    'text':      ('str', _ARROW_TYPES['text']),
+}
+
+CSV_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+DATA_TYPES = list(TAXI_SCHEMAS)
+
+
+def detect_data_type(url: str, default: str | None = None) -> str | None:
+    """Take the taxi type from a TLC-style file name, e.g. yellow_tripdata_2024-01.parquet."""
+    name = os.path.basename(url.split('?', 1)[0])
+    prefix = name.split('_tripdata', 1)[0]
+    return prefix if '_tripdata' in name and prefix in TAXI_SCHEMAS else default
+
+
+def column_types(data_type: str | None, columns) -> dict[str, str]:
+    """Map the file's own column names to their declared logical types."""
+    if data_type is None:
+        return {}
+    declared = {name.lower(): kind for name, kind in TAXI_SCHEMAS[data_type].items()}
+    return {col: declared[col.lower()] for col in columns if col.lower() in declared}
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _copy_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Return the chunk with its index as a column, matching the table to_sql creates."""
+    return chunk.reset_index()
+
+
+def _encode_csv(df: pd.DataFrame) -> io.BytesIO:
+    """Encode a DataFrame as headerless CSV with missing values written as CSV_NULL."""
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, header=False, encoding='utf-8', na_rep=CSV_NULL)
+    buf.seek(0)
+    return buf
+
+
+def _binary_column(series: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Encode one column for PGCOPY binary format.
+
+    Returns (lengths, payload): per-row field lengths (-1 for NULL) and an
+    (n_rows, width) uint8 matrix of big-endian payloads, right-padded for
+    variable-length values and ignored where the value is NULL.
+    """
+    nulls = series.isna().to_numpy()
+    dtype = series.dtype
+
+    if pd.api.types.is_bool_dtype(dtype):
+        values = series.to_numpy(dtype='u1', na_value=0)
+    elif pd.api.types.is_integer_dtype(dtype):
+        # Match the widths pandas/SQLAlchemy pick: SMALLINT, INTEGER, BIGINT
+        width = max(series.dtype.itemsize, 2)
+        values = series.to_numpy(dtype=f'>i{width}', na_value=0)
+    elif pd.api.types.is_float_dtype(dtype):
+        width = series.dtype.itemsize
+        values = series.to_numpy(dtype=f'>f{width}', na_value=np.nan)
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        stamps = series.to_numpy(dtype='datetime64[us]')
+        values = (stamps - PG_EPOCH).astype('>i8')
+    elif pd.api.types.is_string_dtype(dtype) or dtype == object:
+        # Arrow already stores strings as one UTF-8 buffer plus offsets
+        arr = pa.array(series.astype('str'), from_pandas=True)
+        if isinstance(arr, pa.ChunkedArray):
+            arr = arr.combine_chunks()
+        arr = arr.cast(pa.large_string())
+        offsets = np.frombuffer(arr.buffers()[1], dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+        data = np.frombuffer(arr.buffers()[2], dtype=np.uint8) if arr.buffers()[2] else np.empty(0, np.uint8)
+        sizes = np.diff(offsets)
+        width = int(sizes.max(initial=0))
+        index = np.minimum(offsets[:-1, None] + np.arange(width), max(len(data) - 1, 0))
+        payload = data[index] if len(data) else np.zeros((len(series), 0), dtype=np.uint8)
+        return np.where(nulls, -1, sizes), payload
+    else:
+        raise ValueError(
+            f"Column '{series.name}' has dtype {dtype}, which the binary COPY encoder "
+            f"does not support; use --load-method copy-csv instead"
+        )
+
+    width = values.dtype.itemsize
+    lengths = np.where(nulls, -1, width)
+    return lengths, values.view(np.uint8).reshape(-1, width)
+
+
+def _encode_binary(df: pd.DataFrame) -> io.BytesIO:
+    """
+    Encode a DataFrame as a PGCOPY binary stream using whole-column numpy operations.
+
+    Every row is int16 field count followed by (int32 length, payload) per field.
+    The fields are laid side by side in one padded (n_rows, max_row_width) matrix,
+    and a boolean mask that drops NULL and padding bytes flattens it, row-major,
+    into exactly the wire format.
+    """
+    n_rows, n_cols = df.shape
+    columns = [_binary_column(df[col]) for col in df.columns]
+    row_width = 2 + sum(4 + payload.shape[1] for _, payload in columns)
+
+    matrix = np.empty((n_rows, row_width), dtype=np.uint8)
+    keep = np.ones((n_rows, row_width), dtype=bool)
+    matrix[:, :2] = np.array([n_cols], dtype='>i2').view(np.uint8)
+
+    pos = 2
+    for lengths, payload in columns:
+        width = payload.shape[1]
+        matrix[:, pos:pos + 4] = lengths.astype('>i4').view(np.uint8).reshape(-1, 4)
+        matrix[:, pos + 4:pos + 4 + width] = payload
+        if (lengths != width).any():
+            keep[:, pos + 4:pos + 4 + width] = np.arange(width) < lengths[:, None]
+        pos += 4 + width
+
+    return io.BytesIO(PGCOPY_HEADER + matrix[keep].tobytes() + PGCOPY_TRAILER)
+
+
+class StageTimings:
+    """Thread-safe accumulator of seconds spent per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = collections.defaultdict(float)
+
+    @contextmanager
+    def measure(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.seconds[stage] += elapsed
+
+
+def copy_chunk(chunk: pd.DataFrame, engine, target_table: str, binary: bool = False,
+               timings: StageTimings | None = None):
+    """Stream one chunk into the target table with COPY FROM STDIN."""
+    timings = timings or StageTimings()
+
+    with timings.measure('encode'):
+        df = _copy_frame(chunk)
+        columns = ', '.join(_quote_ident(c) for c in df.columns)
+        options = 'FORMAT binary' if binary else f"FORMAT csv, NULL '{CSV_NULL}'"
+        sql = f'COPY {_quote_ident(target_table)} ({columns}) FROM STDIN WITH ({options})'
+        buf = _encode_binary(df) if binary else _encode_csv(df)
+
+    with timings.measure('load'):
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cur:
+                if hasattr(cur, 'copy_expert'):
+                    # psycopg2
+                    cur.copy_expert(sql, buf)
+                else:
+                    # psycopg 3 (the SQLAlchemy 2.1+ default for postgresql://)
+                    with cur.copy(sql) as copy:
+                        while block := buf.read(COPY_BLOCK_SIZE):
+                            copy.write(block)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def load_chunk(chunk: pd.DataFrame, engine, target_table: str, load_method: str = 'copy-csv',
+               timings: StageTimings | None = None):
+    """Append one chunk to the target table using the selected load method."""
+    if load_method == 'insert':
+        with (timings or StageTimings()).measure('load'):
+            chunk.to_sql(name=target_table, con=engine, if_exists="append")
+    elif load_method in ('copy-csv', 'copy-binary'):
+        copy_chunk(chunk, engine, target_table, binary=(load_method == 'copy-binary'), timings=timings)
+    else:
+        raise ValueError(f"Unknown load method '{load_method}'. Valid: {LOAD_METHODS}")
+
+
+def _load_worker(work: queue.Queue, engine, target_table: str, load_method: str,
+                 timings: StageTimings, progress, errors: list, failed: threading.Event):
+    """Consume chunks from the queue until the None sentinel arrives."""
+    while True:
+        with timings.measure('loader idle'):
+            chunk = work.get()
+        if chunk is None:
+            return
+        if failed.is_set():
+            # Keep draining so the producer never blocks on a full queue
+            continue
+        try:
+            load_chunk(chunk, engine, target_table, load_method, timings)
+            progress.update(len(chunk))
+        except Exception as exc:
+            errors.append(exc)
+            failed.set()
+
+
+def run_pipeline(chunks, engine, target_table: str, load_method: str, workers: int,
+                 timings: StageTimings, progress, quality=None, row_keys: list[str] | None = None) -> int:
+    """
+    Decode chunks on the calling thread and load them on `workers` threads.
+
+    The queue holds at most two chunks per worker, so a slow database applies
+    backpressure to the reader instead of letting decoded chunks pile up in memory.
+    Each worker checks its own connection out of the engine pool per chunk.
+    With a QualityCheck, failing rows are diverted before a chunk is queued;
+    with `row_keys`, unique_row_id is then added over those columns.
+    Returns the number of rows handed to the loaders.
+    """
+    work = queue.Queue(maxsize=2 * workers)
+    errors: list[Exception] = []
+    failed = threading.Event()
+    threads = [
+        threading.Thread(
+            target=_load_worker,
+            args=(work, engine, target_table, load_method, timings, progress, errors, failed),
+            name=f'loader-{i}',
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    rows_queued = 0
+    try:
+        while not failed.is_set():
+            with timings.measure('decode'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            if quality is not None:
+                checked = len(chunk)
+                with timings.measure('validate'):
+                    chunk = quality.apply(chunk)
+                # Quarantined rows are done as far as the progress bar is concerned
+                progress.update(checked - len(chunk))
+                if chunk.empty:
+                    continue
+            if row_keys is not None:
+                with timings.measure('row ids'):
+                    chunk = with_row_ids(chunk, row_keys)
+            with timings.measure('queue wait'):
+                work.put(chunk)
+            rows_queued += len(chunk)
+    finally:
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return rows_queued
+
+
+# Keep Arrow integer columns integer in pandas even when a batch contains nulls,
+# so every batch maps to the same table column types
+PARQUET_INTEGER_DTYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.uint8(): pd.UInt8Dtype(),
+    pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(),
+    pa.uint64(): pd.UInt64Dtype(),
+}
+
+
+@contextmanager
+def _local_parquet(url: str):
+    """
+    Yield a seekable local path for a Parquet source.
+
+    Parquet keeps its footer at the end of the file, so remote files are spooled
+    to a temporary file on disk (not memory) before being read batch by batch.
+    """
+    if not url.startswith(('http://', 'https://')):
+        yield url
+        return
+    with tempfile.NamedTemporaryFile(suffix='.parquet') as tmp:
+        with urllib.request.urlopen(url) as resp:
+            shutil.copyfileobj(resp, tmp, DOWNLOAD_BLOCK_SIZE)
+        tmp.flush()
+        yield tmp.name
+
+
+def iter_parquet_chunks(url: str, chunksize: int, data_type: str | None = None):
+    """
+    Stream a Parquet file as DataFrames of at most `chunksize` rows.
+
+    Only one record batch is converted to pandas at a time, so resident memory is
+    bounded by the batch (plus the row group Arrow is decoding), not the file.
+    Batches are cast to the registry types for `data_type` while still in Arrow.
+    The first item yielded is the file's total row count.
+    """
+    with _local_parquet(url) as path:
+        parquet_file = pq.ParquetFile(path)
+        yield parquet_file.metadata.num_rows
+
+        file_schema = parquet_file.schema_arrow
+        types = column_types(data_type, file_schema.names)
+        target_schema = pa.schema([
+            field.with_type(COLUMN_TYPES[types[field.name]][1]) if field.name in types else field
+            for field in file_schema
+        ])
+
+        offset = 0
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            table = pa.Table.from_batches([batch])
+            if target_schema != file_schema:
+                table = table.cast(target_schema)
+            chunk = table.to_pandas(types_mapper=PARQUET_INTEGER_DTYPES.get)
+            # Keep the index continuous across batches, as to_sql writes it as a column
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+
+def iter_csv_chunks(url: str, chunksize: int, data_type: str | None = None, compression: str = 'infer'):
+    """
+    Stream a CSV file with the registry's dtypes and date columns passed to the reader.
+
+    The header is read first so only columns present in this file are declared.
+    Integer columns are parsed as float64 and narrowed afterwards, because CSV
+    exports written by pandas spell nullable integers as '1.0'.
+    """
+    header = pd.read_csv(url, nrows=0, compression=compression).columns
+    types = column_types(data_type, header)
+    integers = {col: COLUMN_TYPES[kind][0] for col, kind in types.items() if kind in ('smallint', 'integer')}
+    dtype = {
+        col: 'float64' if col in integers else COLUMN_TYPES[kind][0]
+        for col, kind in types.items() if kind != 'timestamp'
+    }
+    parse_dates = [col for col, kind in types.items() if kind == 'timestamp']
+
+    reader = pd.read_csv(
+        url, iterator=True, chunksize=chunksize, compression=compression,
+        dtype=dtype, parse_dates=parse_dates, date_format=CSV_DATETIME_FORMAT,
+    )
+    for chunk in reader:
+        yield chunk.astype(integers) if integers else chunk
+
+
+def resolve_source(url: str, use_cache: bool = True) -> str:
+    """Return a local cached copy of a remote URL when the shared cache is available."""
+    if use_cache and DownloadCache is not None and url.startswith(('http://', 'https://')):
+        return DownloadCache().fetch(url)
+    return url
+
+
+def iter_chunks(url: str, chunksize: int, data_type: str | None = None, use_cache: bool = True):
+    """Return (total_rows, chunk iterator) for a CSV or Parquet source."""
+    source = resolve_source(url, use_cache)
+    if url.endswith('.parquet'):
+        chunks = iter_parquet_chunks(source, chunksize, data_type)
+        total_rows = next(chunks)
+        return total_rows, chunks
+    # Cached blobs have no extension, so take the compression from the URL
+    compression = 'gzip' if url.endswith('.gz') else 'infer'
+    return None, iter_csv_chunks(source, chunksize, data_type, compression)
+
+
+def replace_table(df: pd.DataFrame, engine, target_table: str):
+    """Drop and recreate the target table from the first chunk's columns."""
+    df.head(0).to_sql(name=target_table, con=engine, if_exists="replace")
+
+
+def ingest_data(url: str, engine, target_table: str, chunksize: int = 100000, load_method: str = 'copy-csv',
+                workers: int = 1, create_table=replace_table, show_progress: bool = True,
+                data_type: str | None = None, use_cache: bool = True, validate: bool = False,
+                quarantine_target: str | None = None, add_row_ids: bool = False) -> int:
+    """
+    Ingest data from URL to PostgreSQL table in chunks.
+
+    Columns declared for `data_type` in TAXI_SCHEMAS are read with those types
+    instead of inferred ones; other columns fall back to inference. Remote files
+    are read through the shared download cache unless `use_cache` is False.
+    `create_table(first_chunk, engine, target_table)` prepares the table before
+    loading starts; batch runs pass one that creates it only once. With
+    `validate` rows failing QUALITY_RULES go to QUARANTINE_TABLE instead,
+    recorded against `quarantine_target` (default: the target table). With
+    `add_row_ids` a unique_row_id column (see row_ids()) is computed over the
+    ROW_KEY_COLUMNS of `data_type` and loaded in front of the others. Returns
+    the number of rows loaded.
+    """
 
-def ingest_data(url: str, engine, target_table: str, chunksize: int = 100000):
-    """Ingest data from URL to PostgreSQL table in chunks."""
-    
     try:
         print(f"Fetching data from: {url}")
-        
-        # Read data based on file format
-        if url.endswith('.parquet'):
-            df = pd.read_parquet(url)
-            total_rows = len(df)
-        else:
-            # For CSV, read first chunk to create table
-            df_iter = pd.read_csv(url, iterator=True, chunksize=chunksize)
-            df = next(df_iter)
-            total_rows = "unknown"
-        
+        timings = StageTimings()
+        started = time.perf_counter()
+
+        # Both formats are streamed; the first chunk is used to create the table
+        with timings.measure('decode'):
+            total_rows, chunks = iter_chunks(url, chunksize, data_type, use_cache)
+            df = next(chunks, None)
+        if df is None:
+            print(f"⚠ No rows found in {url}")
+            return 0
+
+        row_keys = None
+        if add_row_ids:
+            row_keys = row_key_columns(df.columns, data_type or detect_data_type(url))
+
         # Create table with schema from first chunk
-        df.head(0).to_sql(name=target_table, con=engine, if_exists="replace")
-        print(f"Table '{target_table}' created")
-        
-        # Insert data in chunks
-        rows_inserted = 0
-        
-        if url.endswith('.parquet'):
-            # Chunk the parquet dataframe
-            chunks = [df.iloc[i:i+chunksize] for i in range(0, len(df), chunksize)]
-            for chunk in tqdm(chunks, desc="Ingesting"):
-                chunk.to_sql(name=target_table, con=engine, if_exists="append")
-                rows_inserted += len(chunk)
-        else:
-            # Process CSV iterator
-            df.to_sql(name=target_table, con=engine, if_exists="append")
-            rows_inserted += len(df)
-            
-            for chunk in tqdm(df_iter, desc="Ingesting"):
-                chunk.to_sql(name=target_table, con=engine, if_exists="append")
-                rows_inserted += len(chunk)
-        
+        create_table(with_row_ids(df.head(0), row_keys) if row_keys is not None else df, engine, target_table)
+        print(f"Table '{target_table}' ready")
+
+        quality = None
+        if validate:
+            quality = QualityCheck(url, engine, quarantine_target or target_table, data_type, flush_rows=chunksize)
+
+        # Decode and load in parallel; loaders pull from a bounded queue
+        with tqdm(total=total_rows, desc="Ingesting", unit="rows", disable=not show_progress) as progress:
+            rows_inserted = run_pipeline(
+                itertools.chain([df], chunks), engine, target_table, load_method, workers, timings, progress,
+                quality, row_keys,
+            )
+        if quality is not None:
+            with timings.measure('validate'):
+                quality.flush()
+
+        elapsed = time.perf_counter() - started
+        rate = rows_inserted / elapsed if elapsed else 0.0
         print(f"✓ Successfully ingested {rows_inserted} rows into '{target_table}'")
-        
+        print(f"  Load method: {load_method}, {workers} worker(s)  ({elapsed:.2f}s total, {rate:,.0f} rows/s)")
+        print_stage_timings(timings, workers)
+        if quality is not None:
+            quality.print_summary()
+        return rows_inserted
+
     except Exception as e:
         print(f"✗ Error during ingestion: {e}", file=sys.stderr)
         raise
 
+
+def print_stage_timings(timings: StageTimings, workers: int):
+    """Print per-stage seconds and which side of the queue is the bottleneck."""
+    seconds = timings.seconds
+    print("  Stage timings (encode/load/idle are summed over loader threads):")
+    for stage in ('decode', 'validate', 'row ids', 'queue wait', 'encode', 'load', 'loader idle'):
+        if stage in ('validate', 'row ids') and stage not in seconds:
+            continue
+        print(f"    {stage:<12}: {seconds[stage]:8.2f}s")
+
+    # The producer waiting on a full queue means loaders cannot keep up, and
+    # loaders waiting on an empty queue means the reader cannot keep up
+    if seconds['queue wait'] > seconds['loader idle'] / workers:
+        side = 'encode' if seconds['encode'] > seconds['load'] else 'database load'
+        print(f"  Bottleneck: loaders, mostly {side} (consider more --workers)")
+    else:
+        print("  Bottleneck: decode (loaders are waiting for chunks)")
+
+# ─────────────────────────────────────────────
+# DATA QUALITY
+# With --validate every decoded chunk is checked on the reader thread before
+# it is queued. Each rule is a boolean mask built from whole columns (no
+# per-row Python), so the check costs a few array passes per chunk. Rows that
+# fail any rule are kept out of the target and written to the quarantine
+# table with the first rule they fail as dq_reason and the row itself as
+# JSON; hit counts per rule (a row can fail several) are printed per file.
+# Pickup/dropoff columns that are not already timestamps (e.g. a CSV read
+# with --infer-types) are parsed first; values that do not parse fail
+# unparsed_datetime, since neither time rule can judge them.
+# ─────────────────────────────────────────────
+QUARANTINE_TABLE = 'ingest_quarantine'
+
+# In priority order: a row's dq_reason is the first of these it fails
+QUALITY_RULES = ['null_key', 'unparsed_datetime', 'negative_fare', 'dropoff_before_pickup',
+                 'pickup_outside_month']
+
+# Columns a trip is useless without
+QUALITY_KEY_COLUMNS = {
+    'yellow': ['VendorID', 'tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID'],
+    'green': ['VendorID', 'lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID'],
+    'fhv': ['dispatching_base_num', 'pickup_datetime'],
+    'fhvhv': ['hvfhs_license_num', 'pickup_datetime', 'dropoff_datetime', 'PULocationID', 'DOLocationID'],
+}
+
+FARE_COLUMNS = {
+    'yellow': ['fare_amount', 'total_amount'],
+    'green': ['fare_amount', 'total_amount'],
+    'fhv': [],
+    'fhvhv': ['base_passenger_fare'],
+}
+
+PICKUP_COLUMNS = {
+    'yellow': 'tpep_pickup_datetime',
+    'green': 'lpep_pickup_datetime',
+    'fhv': 'pickup_datetime',
+    'fhvhv': 'pickup_datetime',
+}
+
+DROPOFF_COLUMNS = {
+    'yellow': 'tpep_dropoff_datetime',
+    'green': 'lpep_dropoff_datetime',
+    'fhv': 'dropOff_datetime',
+    'fhvhv': 'dropoff_datetime',
+}
+
+
+def file_month(url: str) -> tuple[int, int] | None:
+    """Take (year, month) from a TLC-style file name, e.g. green_tripdata_2025-11.parquet."""
+    match = re.search(r'_tripdata_(\d{4})-(\d{2})', os.path.basename(url.split('?', 1)[0]))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def ensure_quarantine(engine):
+    with engine.begin() as conn:
+        # Concurrent batch loads would race on CREATE TABLE IF NOT EXISTS
+        conn.exec_driver_sql('SELECT pg_advisory_xact_lock(hashtext(%(name)s))', {'name': QUARANTINE_TABLE})
+        conn.exec_driver_sql(f"""
+            CREATE TABLE IF NOT EXISTS {QUARANTINE_TABLE} (
+                target_table    text        NOT NULL,
+                filename        text        NOT NULL,
+                row_number      bigint      NOT NULL,
+                dq_reason       text        NOT NULL,
+                record          jsonb       NOT NULL,
+                quarantined_at  timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+
+
+class QualityCheck:
+    """
+    The rule set bound to one source file, plus its quarantine writer.
+
+    Rules whose columns the file does not have are skipped, and the month rule
+    needs a TLC-style file name. Rows quarantined by an earlier run of the
+    same file into the same target are deleted first, so reruns replace them.
+    """
+
+    def __init__(self, url: str, engine, target_table: str, data_type: str | None, flush_rows: int = 100000):
+        self.engine = engine
+        self.target_table = target_table
+        self.filename = os.path.basename(url.split('?', 1)[0])
+        self.data_type = data_type or detect_data_type(url)
+        self.flush_rows = flush_rows
+        month = file_month(url)
+        self.month = tuple(map(np.datetime64, _month_bounds(*month))) if month else None
+
+        self.hits = dict.fromkeys(QUALITY_RULES, 0)
+        self.rows_checked = 0
+        self.rows_quarantined = 0
+        self._pending: list[pd.DataFrame] = []
+        self._pending_rows = 0
+
+        ensure_quarantine(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f'DELETE FROM {QUARANTINE_TABLE} WHERE target_table = %(table)s AND filename = %(filename)s',
+                {'table': target_table, 'filename': self.filename},
+            )
+
+    def masks(self, chunk: pd.DataFrame) -> dict[str, np.ndarray]:
+        """One boolean array per rule, True where the row fails it; NULLs only fail null_key."""
+        by_lower = {c.lower(): c for c in chunk.columns}
+
+        def present(names) -> list[str]:
+            return [by_lower[n.lower()] for n in names if n and n.lower() in by_lower]
+
+        keys = present(QUALITY_KEY_COLUMNS.get(self.data_type, []))
+        fares = present(FARE_COLUMNS.get(self.data_type, []))
+        pickup = present([PICKUP_COLUMNS.get(self.data_type)])
+        dropoff = present([DROPOFF_COLUMNS.get(self.data_type)])
+
+        def any_of(masks) -> np.ndarray:
+            return np.logical_or.reduce(masks) if masks else np.zeros(len(chunk), dtype=bool)
+
+        def values(expr: pd.Series) -> np.ndarray:
+            return expr.to_numpy(dtype=bool, na_value=False)
+
+        times, unparsed = {}, []
+        for c in pickup + dropoff:
+            if pd.api.types.is_datetime64_any_dtype(chunk[c]):
+                times[c] = chunk[c]
+            else:
+                times[c] = pd.to_datetime(chunk[c], errors='coerce')
+                unparsed.append((times[c].isna() & chunk[c].notna()).to_numpy())
+
+        return {
+            'null_key': any_of([chunk[c].isna().to_numpy() for c in keys]),
+            'unparsed_datetime': any_of(unparsed),
+            'negative_fare': any_of([values(chunk[c] < 0) for c in fares]),
+            'dropoff_before_pickup': any_of(
+                [values(times[dropoff[0]] < times[pickup[0]])] if pickup and dropoff else []),
+            'pickup_outside_month': any_of(
+                [values((times[pickup[0]] < self.month[0]) | (times[pickup[0]] >= self.month[1]))]
+                if pickup and self.month else []),
+        }
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Return the rows that pass every rule; the rest are queued for quarantine."""
+        masks = self.masks(chunk)
+        failed = np.logical_or.reduce(list(masks.values()))
+        for rule, mask in masks.items():
+            self.hits[rule] += int(np.count_nonzero(mask))
+        self.rows_checked += len(chunk)
+        if not failed.any():
+            return chunk
+
+        bad = chunk[failed]
+        reason = np.select([masks[rule][failed] for rule in QUALITY_RULES], QUALITY_RULES, default='')
+        # One to_json call for the whole block rather than one per row
+        records = bad.to_json(orient='records', lines=True, date_format='iso', date_unit='us')
+        quarantined = pd.DataFrame({
+            'target_table': self.target_table,
+            'filename': self.filename,
+            'dq_reason': reason,
+            'record': records.splitlines(),
+        }, index=bad.index.rename('row_number'))
+        self._pending.append(quarantined)
+        self._pending_rows += len(quarantined)
+        self.rows_quarantined += len(quarantined)
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+        return chunk[~failed]
+
+    def flush(self):
+        if not self._pending:
+            return
+        # CSV quotes the JSON text; Postgres parses it into jsonb on the way in
+        copy_chunk(pd.concat(self._pending), self.engine, QUARANTINE_TABLE)
+        self._pending, self._pending_rows = [], 0
+
+    def print_summary(self):
+        share = self.rows_quarantined / self.rows_checked if self.rows_checked else 0.0
+        print(f"  Quality: {self.rows_quarantined} of {self.rows_checked} rows quarantined ({share:.2%}) "
+              f"into '{QUARANTINE_TABLE}'")
+        for rule in QUALITY_RULES:
+            print(f"    {rule:<22}: {self.hits[rule]}")
+
+
+# ─────────────────────────────────────────────
+# INCREMENTAL MODE
+# Mirrors the Kestra 04_postgres_taxi flow: each file is loaded into its own
+# staging table and merged into the target on unique_row_id, a hash over the
+# columns that identify a trip. Unlike the flow's md5 UPDATE, the id is
+# computed while the chunks stream through (row_ids) and stored as a 16-byte
+# uuid, so the merge only joins on an indexed fixed-width key. A manifest
+# table records every merged file, so files already loaded are skipped
+# before anything is downloaded.
+# ─────────────────────────────────────────────
+MANIFEST_TABLE = 'ingest_manifest'
+
+# Same columns and order as the Kestra flow's unique_row_id
+ROW_KEY_COLUMNS = {
+    'yellow': ['VendorID', 'tpep_pickup_datetime', 'tpep_dropoff_datetime', 'PULocationID', 'DOLocationID',
+               'fare_amount', 'trip_distance'],
+    'green': ['VendorID', 'lpep_pickup_datetime', 'lpep_dropoff_datetime', 'PULocationID', 'DOLocationID',
+              'fare_amount', 'trip_distance'],
+    'fhv': ['dispatching_base_num', 'pickup_datetime', 'dropOff_datetime', 'PUlocationID', 'DOlocationID'],
+    'fhvhv': ['hvfhs_license_num', 'dispatching_base_num', 'pickup_datetime', 'dropoff_datetime',
+              'PULocationID', 'DOLocationID', 'trip_miles', 'base_passenger_fare'],
+}
+
+
+def ensure_manifest(engine):
+    with engine.begin() as conn:
+        # Concurrent batch loads would race on CREATE TABLE IF NOT EXISTS
+        conn.exec_driver_sql('SELECT pg_advisory_xact_lock(hashtext(%(name)s))', {'name': MANIFEST_TABLE})
+        conn.exec_driver_sql(f"""
+            CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                target_table  text        NOT NULL,
+                source_url    text        NOT NULL,
+                filename      text        NOT NULL,
+                rows_staged   bigint      NOT NULL,
+                rows_merged   bigint      NOT NULL,
+                loaded_at     timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (target_table, source_url)
+            )
+        """)
+
+
+def is_loaded(engine, target_table: str, url: str) -> bool:
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(
+            f'SELECT 1 FROM {MANIFEST_TABLE} WHERE target_table = %(table)s AND source_url = %(url)s',
+            {'table': target_table, 'url': url},
+        ).first()
+    return row is not None
+
+
+def replace_staging_table(df: pd.DataFrame, engine, target_table: str):
+    """Recreate the staging table, unlogged since it only lives for one run."""
+    replace_table(df, engine, target_table)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'ALTER TABLE {_quote_ident(target_table)} SET UNLOGGED')
+
+
+def _table_columns(conn, table: str) -> dict[str, str]:
+    """Return {column: full Postgres type} in ordinal order."""
+    rows = conn.exec_driver_sql(
+        'SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_attribute a '
+        'WHERE a.attrelid = %(table)s::regclass AND a.attnum > 0 AND NOT a.attisdropped ORDER BY a.attnum',
+        {'table': _quote_ident(table)},
+    ).all()
+    return dict(rows)
+
+
+# Seeds and word multipliers of the two 64-bit lanes that make up the 128-bit row id
+ROW_ID_SEEDS = np.array([0x243F6A8885A308D3, 0x13198A2E03707344], dtype=np.uint64)
+ROW_ID_MULTIPLIERS = np.array([1, 0x9E3779B97F4A7C15], dtype=np.uint64)
+
+
+def row_key_columns(columns, data_type: str | None) -> list[str]:
+    """The data type's key columns present in `columns`, or every column if the type is unknown."""
+    if data_type in ROW_KEY_COLUMNS:
+        by_lower = {c.lower(): c for c in columns}
+        return [by_lower[k.lower()] for k in ROW_KEY_COLUMNS[data_type] if k.lower() in by_lower]
+    return [c for c in columns if c not in ('index', 'unique_row_id')]
+
+
+def _mix64(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, in place: every input bit affects every output bit."""
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return h
+
+
+def _row_key_series(series: pd.Series) -> pd.Series:
+    """Widen a key column to one canonical type, so the id does not depend on the declared width."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype):
+        return series.astype('Int64')
+    if pd.api.types.is_float_dtype(dtype):
+        return series.astype('float64') + 0.0  # -0.0 -> 0.0
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        return series.astype('datetime64[us]')
+    return series.astype('str')
+
+
+def _fold(lanes: np.ndarray, words: np.ndarray) -> np.ndarray:
+    return _mix64(lanes ^ (words[:, None] * ROW_ID_MULTIPLIERS))
+
+
+def row_ids(chunk: pd.DataFrame, keys: list[str]) -> pd.Series:
+    """
+    A 128-bit id per row over `keys`, as 32 hex digits (Postgres uuid input).
+
+    Key values are taken in their PGCOPY binary form (big-endian payload) and
+    folded 8 bytes at a time into two independently seeded 64-bit lanes, with
+    whole-column numpy operations. Fixed-width values are one word each, with
+    NULLs as zero plus a flag bit folded in at the end; strings are folded
+    with their length and only up to it, so a row gets the same id whatever
+    chunk, file or declared column widths it arrives with.
+    """
+    n_rows = len(chunk)
+    lanes = np.tile(ROW_ID_SEEDS, (n_rows, 1))
+    null_flags = []
+    for col in keys:
+        series = _row_key_series(chunk[col])
+        lengths, payload = _binary_column(series)
+
+        if not pd.api.types.is_string_dtype(series.dtype):
+            width = payload.shape[1]
+            word = np.zeros((n_rows, 8), dtype=np.uint8)
+            word[:, 8 - width:] = payload
+            word = word.view('>u8')[:, 0].astype(np.uint64)
+            word[lengths < 0] = 0
+            null_flags.append(lengths < 0)
+            lanes = _fold(lanes, word)
+            continue
+
+        # Bytes past a string's length (NULLs, padding to the longest) must not reach the hash
+        payload = np.where(np.arange(payload.shape[1]) < lengths[:, None], payload, 0).astype(np.uint8)
+        pad = -payload.shape[1] % 8
+        if pad:
+            payload = np.hstack([payload, np.zeros((n_rows, pad), dtype=np.uint8)])
+        words = np.ascontiguousarray(payload).view('>u8').astype(np.uint64)
+        used = (np.maximum(lengths, 0) + 7) // 8
+        lanes = _fold(lanes, lengths.astype(np.int64).view(np.uint64))
+        for j in range(words.shape[1]):
+            lanes = np.where((used > j)[:, None], _fold(lanes, words[:, j]), lanes)
+
+    if null_flags:
+        flags = np.packbits(np.column_stack(null_flags), axis=1, bitorder='little')
+        flags = np.hstack([flags, np.zeros((n_rows, -flags.shape[1] % 8), dtype=np.uint8)])
+        for word in np.ascontiguousarray(flags).view('<u8').T:
+            lanes = _fold(lanes, word.astype(np.uint64))
+
+    # Hex digits straight into an Arrow string buffer, no Python str per row
+    hexed = lanes.astype('>u8').tobytes().hex().encode('ascii')
+    offsets = np.arange(0, 32 * n_rows + 1, 32, dtype=np.int32)
+    ids = pa.StringArray.from_buffers(n_rows, pa.py_buffer(offsets), pa.py_buffer(hexed))
+    return pd.Series(ids, index=chunk.index, dtype='str')
+
+
+def with_row_ids(chunk: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Return the chunk with unique_row_id as its first column."""
+    return pd.concat([row_ids(chunk, keys).rename('unique_row_id'), chunk], axis=1)
+
+
+def merge_staging(engine, staging_table: str, target_table: str, url: str, rows_staged: int) -> int:
+    """
+    Merge a staging table into the target and record the file in the manifest.
+
+    The staging table carries unique_row_id as hex text (from row_ids). The
+    target is created on first use with it as uuid and filename in front of
+    the staged columns, plus a unique index on unique_row_id; columns that
+    appear in newer files are added to it. The merge and the manifest row share
+    one transaction, so a file is either fully merged and recorded or neither.
+    Returns the number of new rows.
+    """
+    filename = os.path.basename(url.split('?', 1)[0])
+    target = _quote_ident(target_table)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('SELECT pg_advisory_xact_lock(hashtext(%(name)s))', {'name': target_table})
+        staged = _table_columns(conn, staging_table)
+        del staged['unique_row_id']
+        column_defs = ', '.join(f'{_quote_ident(c)} {t}' for c, t in staged.items())
+        conn.exec_driver_sql(
+            f'CREATE TABLE IF NOT EXISTS {target} (unique_row_id uuid, filename text, {column_defs})'
+        )
+        existing = _table_columns(conn, target_table)
+        if 'unique_row_id' not in existing:
+            raise ValueError(
+                f"'{target_table}' has no unique_row_id column, so it was not built by --incremental "
+                f"(e.g. a full load); merge into another --target-table or drop this one first"
+            )
+        if existing['unique_row_id'] != 'uuid':
+            raise ValueError(
+                f"'{target_table}' has md5 text unique_row_ids from an older version of this script, "
+                f"which the new ids would not match; drop it and its {MANIFEST_TABLE} rows to reload"
+            )
+        conn.exec_driver_sql(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {_quote_ident(f"{target_table}_unique_row_id_idx")} '
+            f'ON {target} (unique_row_id)'
+        )
+        for col, col_type in staged.items():
+            if col not in existing:
+                conn.exec_driver_sql(f'ALTER TABLE {target} ADD COLUMN {_quote_ident(col)} {col_type}')
+
+        columns = ['unique_row_id', 'filename', *staged]
+        insert_cols = ', '.join(_quote_ident(c) for c in columns)
+        values = ', '.join(f'S.{_quote_ident(c)}' for c in columns)
+        staged_cols = ', '.join(f'S.{_quote_ident(c)}' for c in staged)
+        result = conn.exec_driver_sql(f"""
+            MERGE INTO {target} AS T
+            USING (
+                SELECT DISTINCT ON (S.unique_row_id)
+                    S.unique_row_id::uuid AS unique_row_id, %(filename)s AS filename, {staged_cols}
+                FROM {_quote_ident(staging_table)} AS S
+            ) AS S
+            ON T.unique_row_id = S.unique_row_id
+            WHEN NOT MATCHED THEN
+                INSERT ({insert_cols}) VALUES ({values})
+        """, {'filename': filename})
+        rows_merged = result.rowcount
+
+        conn.exec_driver_sql(f"""
+            INSERT INTO {MANIFEST_TABLE} (target_table, source_url, filename, rows_staged, rows_merged)
+            VALUES (%(table)s, %(url)s, %(filename)s, %(staged)s, %(merged)s)
+            ON CONFLICT (target_table, source_url) DO UPDATE
+            SET rows_staged = EXCLUDED.rows_staged, rows_merged = EXCLUDED.rows_merged, loaded_at = now()
+        """, {'table': target_table, 'url': url, 'filename': filename, 'staged': rows_staged, 'merged': rows_merged})
+        conn.exec_driver_sql(f'DROP TABLE {_quote_ident(staging_table)}')
+
+    return rows_merged
+
+
+def ingest_incremental(url: str, engine, target_table: str, data_type: str | None = None,
+                       force: bool = False, **ingest_kwargs) -> int:
+    """
+    Stage one file and merge it into the target, unless the manifest says it is loaded.
+
+    Each file gets its own staging table, so concurrent batch loads into the same
+    target do not collide. Returns the number of new rows merged.
+    """
+    ensure_manifest(engine)
+    if not force and is_loaded(engine, target_table, url):
+        print(f"⏭ Already loaded into '{target_table}', skipping: {url}")
+        return 0
+
+    stem = os.path.basename(url.split('?', 1)[0]).split('.', 1)[0]
+    # Postgres truncates identifiers at 63 bytes
+    staging_table = f"{target_table}_stg_{''.join(c if c.isalnum() else '_' for c in stem)}"[:63]
+
+    rows_staged = ingest_data(url=url, engine=engine, target_table=staging_table,
+                              create_table=replace_staging_table, data_type=data_type, add_row_ids=True,
+                              quarantine_target=target_table, **ingest_kwargs)
+    rows_merged = merge_staging(engine, staging_table, target_table, url, rows_staged)
+    print(f"✓ Merged {rows_merged} new of {rows_staged} staged rows into '{target_table}'")
+    return rows_merged
+
+
+# ─────────────────────────────────────────────
+# BATCH MODE
+# Several (data type, year, month) files are loaded concurrently, one
+# process per file, either into one table per data type or into a table
+# range-partitioned by pickup month.
+# ─────────────────────────────────────────────
+def build_url(data_type: str, year: int, month: int, file_format: str) -> str:
+    if file_format == 'parquet':
+        return f'https://d37ci6vzurychx.cloudfront.net/trip-data/{data_type}_tripdata_{year:04d}-{month:02d}.parquet'
+    return f'https://github.com/DataTalksClub/nyc-tlc-data/releases/download/{data_type}/{data_type}_tripdata_{year:04d}-{month:02d}.csv.gz'
+
+
+def _parse_values(raw: str, name: str, valid: list) -> list:
+    """Parse 'all', comma-separated values and inclusive 'a-b' integer ranges."""
+    if raw.lower() == 'all':
+        return list(valid)
+    values = []
+    for part in (p.strip() for p in raw.split(',')):
+        if all(isinstance(v, int) for v in valid) and '-' in part:
+            try:
+                lo, hi = (int(v) for v in part.split('-', 1))
+            except ValueError:
+                raise argparse.ArgumentTypeError(f"'{part}' is not a valid {name} range")
+            values.extend(range(lo, hi + 1))
+        elif all(isinstance(v, int) for v in valid):
+            try:
+                values.append(int(part))
+            except ValueError:
+                raise argparse.ArgumentTypeError(f"'{part}' is not a valid {name}")
+        else:
+            values.append(part)
+    bad = [v for v in values if v not in valid]
+    if bad:
+        raise argparse.ArgumentTypeError(f"invalid {name} value(s): {bad}")
+    return list(dict.fromkeys(values))
+
+
+def parse_years(raw: str) -> list[int]:
+    # TLC has nothing before 2009 and nothing after the current year
+    return _parse_values(raw, 'year', list(range(2009, datetime.date.today().year + 1)))
+
+
+def parse_months(raw: str) -> list[int]:
+    return _parse_values(raw, 'month', list(range(1, 13)))
+
+
+def parse_data_types(raw: str) -> list[str]:
+    return _parse_values(raw, 'data type', DATA_TYPES)
+
+
+def batch_table_name(template: str, data_type: str) -> str:
+    return template.format(data_type=data_type)
+
+
+def _month_bounds(year: int, month: int) -> tuple[str, str]:
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01'
+
+
+def create_shared_table(df: pd.DataFrame, engine, target_table: str, pickup_column: str | None = None,
+                        months: tuple = ()):
+    """
+    Create a table shared by concurrent batch loads, once.
+
+    A transaction-scoped advisory lock serializes the processes, so only the
+    first one through creates the table; the rest find it already there. With a
+    pickup column the table is range-partitioned by month: one partition per
+    (year, month) in the batch plus a DEFAULT partition for out-of-month trips.
+    All partitions are created up front, since a month partition cannot be added
+    once the DEFAULT partition holds rows for that month. Columns this file has
+    and the table lacks (TLC adds some over the years, e.g. cbd_congestion_fee
+    in 2025) are added under the same lock, whichever file created the table.
+    """
+    frame = _copy_frame(df.head(0))
+    ddl = pd.io.sql.get_schema(frame, target_table, con=engine)
+    if pickup_column:
+        ddl = f'{ddl.rstrip()} PARTITION BY RANGE ({_quote_ident(pickup_column)})'
+    ddl = ddl.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('SELECT pg_advisory_xact_lock(hashtext(%(name)s))', {'name': target_table})
+        conn.exec_driver_sql(ddl)
+        if pickup_column:
+            for year, month in months:
+                lower, upper = _month_bounds(year, month)
+                conn.exec_driver_sql(
+                    f'CREATE TABLE IF NOT EXISTS {_quote_ident(f"{target_table}_{year:04d}_{month:02d}")} '
+                    f'PARTITION OF {_quote_ident(target_table)} '
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                )
+            conn.exec_driver_sql(
+                f'CREATE TABLE IF NOT EXISTS {_quote_ident(f"{target_table}_default")} '
+                f'PARTITION OF {_quote_ident(target_table)} DEFAULT'
+            )
+
+        existing = _table_columns(conn, target_table)
+        missing = [col for col in frame.columns if col not in existing]
+        if missing:
+            # The types to_sql / get_schema would have given these columns
+            table = pd.io.sql.SQLTable(target_table, pd.io.sql.SQLDatabase(conn), frame=frame, index=False)
+            for col in table.table.columns:
+                if col.name in missing:
+                    conn.exec_driver_sql(f'ALTER TABLE {_quote_ident(target_table)} ADD COLUMN '
+                                         f'{_quote_ident(col.name)} {col.type.compile(dialect=engine.dialect)}')
+
+
+def _ingest_batch_file(job: dict) -> tuple[str, int, str | None]:
+    """Process-pool entry point: load one file with its own small engine."""
+    label = f"{job['data_type']} {job['year']:04d}-{job['month']:02d}"
+    engine = create_engine(job['db_url'], pool_size=job['workers'], max_overflow=0)
+    create_table = functools.partial(
+        create_shared_table,
+        pickup_column=PICKUP_COLUMNS[job['data_type']] if job['partitioned'] else None,
+        months=job['months'],
+    )
+    load_kwargs = dict(
+        chunksize=job['chunksize'], load_method=job['load_method'], workers=job['workers'], show_progress=False,
+        use_cache=job['use_cache'], validate=job['validate'],
+    )
+    data_type = None if job['infer_types'] else job['data_type']
+    try:
+        if job['incremental']:
+            rows = ingest_incremental(job['url'], engine, job['target_table'], data_type=data_type,
+                                      force=job['force'], **load_kwargs)
+        else:
+            rows = ingest_data(url=job['url'], engine=engine, target_table=job['target_table'],
+                               create_table=create_table, data_type=data_type, **load_kwargs)
+        return label, rows, None
+    except Exception as exc:
+        return label, 0, str(exc)
+    finally:
+        engine.dispose()
+
+
+def run_batch(db_url: str, data_types: list[str], years: list[int], months: list[int], target_table: str,
+              file_format: str, chunksize: int, load_method: str, processes: int, max_connections: int,
+              partitioned: bool, infer_types: bool = False, incremental: bool = False, force: bool = False,
+              use_cache: bool = True, validate: bool = False) -> bool:
+    """
+    Load every (data type, year, month) combination concurrently.
+
+    Total open connections stay within `max_connections`: the pool runs at most
+    that many processes, and each process gets `max_connections // processes`
+    loader threads (at least one). Target tables are dropped once up front and
+    recreated by the first file to arrive, unless `incremental` is set, in which
+    case each file is merged into the existing tables (re-merging files the
+    manifest already lists when `force` is set). Returns True if every file
+    loaded.
+    """
+    if len(data_types) > 1 and '{data_type}' not in target_table:
+        # Each taxi type has its own columns, so they cannot share one table
+        target_table = f'{target_table}_{{data_type}}'
+
+    processes = max(1, min(processes, max_connections))
+    workers = max(1, max_connections // processes)
+    tasks = list(itertools.product(data_types, years, months))
+    batch_months = tuple(sorted({(year, month) for _, year, month in tasks}))
+
+    print(f"Batch: {len(tasks)} file(s), {processes} process(es) x {workers} connection(s)")
+
+    if not incremental:
+        engine = create_engine(db_url)
+        with engine.begin() as conn:
+            for data_type in data_types:
+                table = batch_table_name(target_table, data_type)
+                conn.exec_driver_sql(f'DROP TABLE IF EXISTS {_quote_ident(table)} CASCADE')
+        engine.dispose()
+
+    jobs = [
+        {
+            'db_url': db_url,
+            'url': build_url(data_type, year, month, file_format),
+            'data_type': data_type,
+            'year': year,
+            'month': month,
+            'months': batch_months,
+            'target_table': batch_table_name(target_table, data_type),
+            'partitioned': partitioned,
+            'chunksize': chunksize,
+            'load_method': load_method,
+            'workers': workers,
+            'infer_types': infer_types,
+            'incremental': incremental,
+            'force': force,
+            'use_cache': use_cache,
+            'validate': validate,
+        }
+        for data_type, year, month in tasks
+    ]
+
+    started = time.perf_counter()
+    total_rows = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=processes) as ex:
+        for label, rows, error in ex.map(_ingest_batch_file, jobs):
+            if error:
+                print(f"✗ {label}: {error}", file=sys.stderr)
+                failed.append(label)
+            else:
+                print(f"✓ {label}: {rows} {'new ' if incremental else ''}rows")
+                total_rows += rows
+
+    elapsed = time.perf_counter() - started
+    print(f"Batch done: {len(tasks) - len(failed)} succeeded, {len(failed)} failed, "
+          f"{total_rows} rows in {elapsed:.1f}s")
+    return not failed
+
+
 def main():
     parser = argparse.ArgumentParser(description='Ingest taxi data into PostgreSQL')
-    
+
     # Database parameters
     parser.add_argument('--pg-user', default=os.getenv('PG_USER', 'root'))
     parser.add_argument('--pg-pass', default=os.getenv('PG_PASSWORD', 'root'))
     parser.add_argument('--pg-host', default=os.getenv('PG_HOST', 'pgdatabase'))
     parser.add_argument('--pg-port', default=os.getenv('PG_PORT', '5432'))
     parser.add_argument('--pg-db', default=os.getenv('PG_DB', 'ny_taxi'))
-    
+
     # Data parameters
     parser.add_argument('--year', type=int, default=2025)
     parser.add_argument('--month', type=int, default=1)
     parser.add_argument('--target-table', default='taxi_data')
     parser.add_argument('--chunksize', type=int, default=100000)
-    parser.add_argument('--data-type', choices=['yellow', 'green', 'fhv', 'fhvhv'], default='green')
+    parser.add_argument('--data-type', choices=DATA_TYPES, default='green')
     parser.add_argument('--file-format', choices=['csv', 'parquet'], default='parquet')
     parser.add_argument('--url', help='Custom URL (overrides auto-generated URL)')
-    
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Read remote files directly instead of through the shared download cache (TLC_CACHE_DIR)')
+    parser.add_argument('--infer-types', action='store_true',
+                        help='Let pandas infer column types instead of using the per-taxi-type schema registry')
+
+    # Load parameters
+    parser.add_argument('--load-method', choices=LOAD_METHODS, default='copy-csv',
+                        help='How chunks are written: to_sql INSERTs, or COPY FROM STDIN with a CSV or binary buffer')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of loader threads (and pooled DB connections) fed by the reader')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Merge into the target on a row hash via a staging table instead of replacing it; '
+                             f'files recorded in {MANIFEST_TABLE} are skipped')
+    parser.add_argument('--force', action='store_true',
+                        help='With --incremental, re-merge files even if the manifest lists them')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check rows against the data-quality rules and divert failures to '
+                             f'{QUARANTINE_TABLE} with a reason code: {", ".join(QUALITY_RULES)}')
+
+    # Batch parameters (any of these switches to batch mode)
+    parser.add_argument('--years', type=parse_years,
+                        help="Batch mode: comma-separated years or ranges, e.g. '2019-2021'")
+    parser.add_argument('--months', type=parse_months,
+                        help="Batch mode: comma-separated months, ranges, or 'all'")
+    parser.add_argument('--data-types', type=parse_data_types,
+                        help=f"Batch mode: comma-separated data types or 'all' ({', '.join(DATA_TYPES)})")
+    parser.add_argument('--processes', type=int, default=4,
+                        help='Batch mode: number of files loaded concurrently')
+    parser.add_argument('--max-connections', type=int, default=8,
+                        help='Batch mode: cap on DB connections across all processes')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='Batch mode: range-partition each target table by pickup month')
+
     args = parser.parse_args()
-    
-    # Build database connection string
-    engine = create_engine(
-        f'postgresql://{args.pg_user}:{args.pg_pass}@{args.pg_host}:{args.pg_port}/{args.pg_db}'
-    )
-    
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.processes < 1 or args.max_connections < 1:
+        parser.error('--processes and --max-connections must be at least 1')
+    if args.incremental and args.partitioned:
+        parser.error('--incremental cannot be combined with --partitioned')
+
+    db_url = f'postgresql://{args.pg_user}:{args.pg_pass}@{args.pg_host}:{args.pg_port}/{args.pg_db}'
+    print(f"Database: {args.pg_host}:{args.pg_port}/{args.pg_db}")
+
+    if args.years or args.months or args.data_types:
+        if args.url:
+            parser.error('--url cannot be combined with batch mode')
+        ok = run_batch(
+            db_url=db_url,
+            data_types=args.data_types or [args.data_type],
+            years=args.years or [args.year],
+            months=args.months or [args.month],
+            target_table=args.target_table,
+            file_format=args.file_format,
+            chunksize=args.chunksize,
+            load_method=args.load_method,
+            processes=args.processes,
+            max_connections=args.max_connections,
+            partitioned=args.partitioned,
+            infer_types=args.infer_types,
+            incremental=args.incremental,
+            force=args.force,
+            use_cache=not args.no_cache,
+            validate=args.validate,
+        )
+        sys.exit(0 if ok else 1)
+
+    # Build database connection; one pooled connection per loader thread
+    engine = create_engine(db_url, pool_size=args.workers, max_overflow=0)
+
     # Determine data URL
-    if args.url:
-        url = args.url
+    url = args.url or build_url(args.data_type, args.year, args.month, args.file_format)
+    data_type = None if args.infer_types else detect_data_type(url, default=args.data_type)
+
+    load_kwargs = dict(chunksize=args.chunksize, load_method=args.load_method, workers=args.workers,
+                       use_cache=not args.no_cache, validate=args.validate)
+    if args.incremental:
+        ingest_incremental(url, engine, args.target_table, data_type=data_type, force=args.force, **load_kwargs)
     else:
-        if args.file_format == 'parquet':
-            url = f'https://d37ci6vzurychx.cloudfront.net/trip-data/{args.data_type}_tripdata_{args.year:04d}-{args.month:02d}.parquet'
-        else:
-            url = f'https://github.com/DataTalksClub/nyc-tlc-data/releases/download/{args.data_type}/{args.data_type}_tripdata_{args.year:04d}-{args.month:02d}.csv.gz'
-    
-    print(f"Database: {args.pg_host}:{args.pg_port}/{args.pg_db}")
-    
-    ingest_data(url=url, engine=engine, target_table=args.target_table, chunksize=args.chunksize)
+        ingest_data(url=url, engine=engine, target_table=args.target_table, data_type=data_type, **load_kwargs)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+"""
+Tests for the --validate data-quality rules in ingest_data.py, and for how
+batch mode hands its options to each file.
+
+    pytest 01-docker-terraform/test_ingest_data.py
+
+QualityCheck only needs the database to create and clear the quarantine
+table, so these run against a stand-in engine and never flush.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest_data
+from ingest_data import QualityCheck
+
+
+URL = 'green_tripdata_2025-11.csv'
+
+HEADER = 'VendorID,lpep_pickup_datetime,lpep_dropoff_datetime,PULocationID,DOLocationID,fare_amount,total_amount'
+ROWS = {
+    'ok':                    '2,2025-11-03 08:00:00,2025-11-03 08:20:00,74,75,12.5,15.0',
+    'negative_fare':         '2,2025-11-03 09:00:00,2025-11-03 09:10:00,74,75,-3.0,-3.0',
+    'dropoff_before_pickup': '2,2025-11-03 10:00:00,2025-11-03 09:50:00,74,75,8.0,9.0',
+    'pickup_outside_month':  '2,2025-10-31 23:50:00,2025-11-01 00:05:00,74,75,8.0,9.0',
+    'null_key':              '2,,2025-11-03 11:00:00,74,75,8.0,9.0',
+}
+UNPARSED = '2,not a date,2025-11-03 12:00:00,74,75,8.0,9.0'
+
+
+class FakeEngine:
+    """Accepts the DDL and DELETE QualityCheck runs on construction, and dispose()."""
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def exec_driver_sql(self, *args, **kwargs):
+        pass
+
+    def dispose(self):
+        pass
+
+
+def write_csv(tmp_path, lines) -> str:
+    path = tmp_path / URL
+    path.write_text('\n'.join([HEADER, *lines]) + '\n')
+    return str(path)
+
+
+def check(path: str, data_type: str | None) -> tuple[QualityCheck, pd.DataFrame, pd.DataFrame]:
+    """Run every chunk of `path` through a QualityCheck; returns it, the passed rows and the input."""
+    chunks = list(ingest_data.iter_csv_chunks(path, chunksize=2, data_type=data_type))
+    quality = QualityCheck(path, FakeEngine(), 'green_taxi_data', 'green', flush_rows=10 ** 9)
+    passed = pd.concat([quality.apply(chunk) for chunk in chunks])
+    return quality, passed, pd.concat(chunks)
+
+
+def reasons(quality: QualityCheck) -> list[str]:
+    return list(pd.concat(quality._pending)['dq_reason']) if quality._pending else []
+
+
+@pytest.mark.parametrize('data_type', ['green', None], ids=['schema', 'infer-types'])
+def test_rules_on_csv(tmp_path, data_type):
+    quality, passed, chunk = check(write_csv(tmp_path, ROWS.values()), data_type)
+    if data_type is None:
+        # The case that used to raise TypeError: pickup/dropoff stay text
+        assert not pd.api.types.is_datetime64_any_dtype(chunk['lpep_pickup_datetime'])
+
+    assert len(passed) == 1 and passed['fare_amount'].tolist() == [12.5]
+    assert reasons(quality) == [r for r in ROWS if r != 'ok']
+    assert quality.hits == {'null_key': 1, 'unparsed_datetime': 0, 'negative_fare': 1,
+                            'dropoff_before_pickup': 1, 'pickup_outside_month': 1}
+
+
+def test_unparsed_datetime_is_quarantined_with_infer_types(tmp_path):
+    quality, passed, _ = check(write_csv(tmp_path, [ROWS['ok'], UNPARSED]), None)
+    assert passed['fare_amount'].tolist() == [12.5]
+    assert reasons(quality) == ['unparsed_datetime']
+    assert quality.rows_quarantined == 1
+
+
+def test_typed_chunk_skips_parsing():
+    chunk = pd.DataFrame({
+        'lpep_pickup_datetime': pd.to_datetime(['2025-11-03 08:00', '2025-12-01 00:00']),
+        'lpep_dropoff_datetime': pd.to_datetime(['2025-11-03 08:20', '2025-11-30 23:00']),
+    })
+    quality = QualityCheck(URL, FakeEngine(), 'green_taxi_data', 'green')
+    masks = quality.masks(chunk)
+    assert not masks['unparsed_datetime'].any()
+    np.testing.assert_array_equal(masks['dropoff_before_pickup'], [False, True])
+    np.testing.assert_array_equal(masks['pickup_outside_month'], [False, True])
+
+
+@pytest.mark.parametrize('force', [False, True])
+def test_batch_passes_force_to_incremental(monkeypatch, force):
+    calls = []
+    monkeypatch.setattr(ingest_data, 'create_engine', lambda *args, **kwargs: FakeEngine())
+    monkeypatch.setattr(ingest_data, 'ingest_incremental',
+                        lambda url, engine, table, **kwargs: calls.append(kwargs) or 0)
+    job = dict(db_url='postgresql://', url=URL, data_type='green', year=2025, month=11, months=((2025, 11),),
+               target_table='green_taxi_data', partitioned=False, chunksize=10, load_method='copy-csv',
+               workers=1, infer_types=False, incremental=True, force=force, use_cache=False, validate=False)
+
+    assert ingest_data._ingest_batch_file(job) == ('green 2025-11', 0, None)
+    assert calls[0]['force'] is force
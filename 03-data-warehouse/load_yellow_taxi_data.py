@@ -1,11 +1,13 @@
 import os
 import sys
-import urllib.request
 from concurrent.futures import ThreadPoolExecutor
 from google.cloud import storage
 from google.api_core.exceptions import NotFound, Forbidden
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from tlc_cache import DownloadCache
+
 
 # Change this to your bucket name
 BUCKET_NAME = "kestra-zoomcamp-taha-demo"
@@ -25,6 +27,9 @@ CHUNK_SIZE = 8 * 1024 * 1024
 
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# Shared with the other ingestion scripts; set TLC_CACHE_DIR to move it
+cache = DownloadCache()
+
 bucket = client.bucket(BUCKET_NAME)
 
 
@@ -34,7 +39,7 @@ def download_file(month):
 
     try:
         print(f"Downloading {url}...")
-        urllib.request.urlretrieve(url, file_path)
+        cache.materialize(url, file_path)
         print(f"Downloaded: {file_path}")
         return file_path
     except Exception as e:
@@ -11,15 +11,27 @@ Supported years       : 2019–2024 (extend VALID_YEARS as needed)
 
 import os
 import sys
+import json
+import base64
+import hashlib
 import time
+import queue
+import random
 import argparse
-import urllib.request
+import threading
 from itertools import product
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from google.cloud import storage
 from google.api_core.exceptions import NotFound, Forbidden
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from tlc_cache import DownloadCache
+from tlc_schemas import TAXI_SCHEMAS, arrow_types
+
 
 # ─────────────────────────────────────────────
 # DATA SOURCE CONFIGURATION
@@ -48,8 +60,48 @@ VALID_YEARS      = list(range(2019, 2025))
 VALID_TAXI_TYPES = ["green", "yellow", "fhv", "fhvhv"]
 VALID_SOURCES    = ["tlc", "dtc"]
 
-CHUNK_SIZE  = 8 * 1024 * 1024  # 8 MB for resumable GCS uploads
-MAX_RETRIES = 3
+CHUNK_SIZE   = 8 * 1024 * 1024  # 8 MB for resumable GCS uploads
+MAX_RETRIES  = 3
+BACKOFF_BASE = 2    # seconds; retry n waits up to BACKOFF_BASE * 2**(n-1)
+BACKOFF_CAP  = 60
+
+RANGE_PART_SIZE = 16 * 1024 * 1024  # bytes per HTTP Range request
+READ_BLOCK_SIZE = 1024 * 1024
+HTTP_TIMEOUT    = (10, 60)          # (connect, read) seconds
+
+# ─────────────────────────────────────────────
+# PARQUET RE-ENCODING (--to-parquet)
+# Declared types come from TAXI_SCHEMAS (shared/tlc_schemas.py, also used by
+# 01-docker-terraform/ingest_data.py); pickup/dropoff columns of every type
+# are normalised to the names below. pyarrow is only imported on this path.
+# ─────────────────────────────────────────────
+NORMALIZED_NAMES = {
+    "tpep_pickup_datetime": "pickup_datetime", "lpep_pickup_datetime": "pickup_datetime",
+    "tpep_dropoff_datetime": "dropoff_datetime", "lpep_dropoff_datetime": "dropoff_datetime",
+    "dropoff_datetime": "dropoff_datetime", "pulocationid": "PULocationID", "dolocationid": "DOLocationID",
+}
+
+ROW_GROUP_ROWS      = 1_000_000
+PARQUET_COMPRESSION = "zstd"
+# Schema metadata key convert_to_parquet() stamps on its output, so a rerun
+# can tell a converted file from a TLC original stored under the same name
+CONVERTED_MARKER    = b"ny_taxi_to_gcs.converted"
+
+STREAM_BUFFER_MB = 256  # default memory budget for --stream across all workers
+CONTENT_TYPES    = {"parquet": "application/octet-stream", "csv.gz": "application/gzip"}
+
+
+# ─────────────────────────────────────────────
+# RETRIES
+# ─────────────────────────────────────────────
+def backoff(attempt: int) -> None:
+    """
+    Sleep before retry `attempt` (1-based) with full-jitter exponential backoff.
+
+    Randomising the whole interval keeps parallel workers that failed together
+    (e.g. on a throttled bucket) from retrying in lockstep.
+    """
+    time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1))))
 
 
 # ─────────────────────────────────────────────
@@ -97,67 +149,567 @@ def build_filename(taxi_type: str, year: int, month: str, source: str) -> str:
     return f"{taxi_type}_tripdata_{year}-{month}.{ext}"
 
 
+def build_session(pool_size: int) -> requests.Session:
+    """One keep-alive connection pool shared by every download thread."""
+    session = requests.Session()
+    retry = Retry(total=MAX_RETRIES, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["HEAD", "GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class RangedDownloader:
+    """
+    Download a file with concurrent HTTP Range requests, resuming partial files.
+
+    Used as the download cache's `downloader`. Files of at least two parts on
+    servers that accept ranges are split into RANGE_PART_SIZE pieces fetched by
+    `parts` threads and written in place; finished pieces are recorded in a
+    `<part>.ranges` sidecar so an interrupted download only refetches missing
+    pieces. Other files are streamed with a single GET that resumes from the
+    partial file's length. The sidecar stores the ETag and the mode, and a
+    changed ETag or a switch between ranged and streamed download restarts
+    from scratch: a ranged part is pre-sized to the full length, so its length
+    says nothing about how much of it a stream could resume from.
+    """
+
+    def __init__(self, session: requests.Session, parts: int = 4, part_size: int = RANGE_PART_SIZE):
+        self.session   = session
+        self.parts     = max(1, parts)
+        self.part_size = part_size
+
+    def __call__(self, url: str, part_path: str) -> dict:
+        head = self.session.head(url, allow_redirects=True, timeout=HTTP_TIMEOUT)
+        head.raise_for_status()
+        # Follow redirects once (GitHub release assets) and range against the target
+        target = head.url
+        size   = int(head.headers["Content-Length"]) if head.headers.get("Content-Length") else None
+        meta   = {
+            "size": size,
+            "etag": head.headers.get("ETag"),
+            "last_modified": head.headers.get("Last-Modified"),
+        }
+        ranged = head.headers.get("Accept-Ranges", "").lower() == "bytes" and size is not None
+
+        mode  = "ranges" if ranged and size >= 2 * self.part_size and self.parts > 1 else "stream"
+        state = self._load_state(part_path, meta["etag"], size, mode)
+        if mode == "ranges":
+            self._download_ranges(target, part_path, size, state)
+        else:
+            received = self._download_stream(target, part_path, size, resume=ranged)
+            meta["size"] = size if size is not None else received
+
+        if os.path.getsize(part_path) != meta["size"]:
+            raise IOError(f"Length mismatch for {url}: "
+                          f"got {os.path.getsize(part_path)} of {meta['size']} bytes")
+        if os.path.exists(part_path + ".ranges"):
+            os.remove(part_path + ".ranges")
+        return meta
+
+    # ── resume state ─────────────────────────────────────────────────────
+    def _load_state(self, part_path: str, etag: str | None, size: int | None, mode: str) -> dict:
+        """Return the sidecar for a resumable partial file, resetting both if stale."""
+        try:
+            with open(part_path + ".ranges") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = None
+        if (state is None or not os.path.exists(part_path)
+                or state.get("etag") != etag or state.get("size") != size
+                or state.get("part_size") != self.part_size or state.get("mode") != mode):
+            state = {"etag": etag, "size": size, "part_size": self.part_size, "mode": mode, "done": []}
+            with open(part_path, "wb"):
+                pass
+            self._save_state(part_path, state)
+        return state
+
+    @staticmethod
+    def _save_state(part_path: str, state: dict) -> None:
+        tmp = part_path + ".ranges.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, part_path + ".ranges")
+
+    # ── transfer ─────────────────────────────────────────────────────────
+    def _download_stream(self, url: str, part_path: str, size: int | None, resume: bool) -> int:
+        offset = os.path.getsize(part_path) if resume else 0
+        if size is not None and offset >= size:
+            if offset == size:
+                return offset   # finished before the last run could remove the sidecar
+            offset = 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as resp:
+            if offset and resp.status_code == 416:
+                offset = None   # the part does not match the file; discard it below
+            else:
+                resp.raise_for_status()
+                if offset and resp.status_code != 206:
+                    offset = 0   # server ignored the Range header; start over
+                with open(part_path, "r+b" if offset else "wb") as out:
+                    out.seek(offset)
+                    for block in resp.iter_content(READ_BLOCK_SIZE):
+                        out.write(block)
+                        offset += len(block)
+        if offset is None:
+            return self._download_stream(url, part_path, size, resume=False)
+        return offset
+
+    def _download_ranges(self, url: str, part_path: str, size: int, state: dict) -> None:
+        with open(part_path, "r+b") as f:
+            f.truncate(size)
+
+        done  = set(state["done"])
+        todo  = [i for i in range((size + self.part_size - 1) // self.part_size) if i not in done]
+        lock  = threading.Lock()
+
+        def _fetch(index: int) -> None:
+            start = index * self.part_size
+            end   = min(start + self.part_size, size) - 1
+            resp  = self.session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=HTTP_TIMEOUT)
+            resp.raise_for_status()
+            if resp.status_code != 206 or len(resp.content) != end - start + 1:
+                raise IOError(f"Bad range response for bytes {start}-{end}: "
+                              f"status {resp.status_code}, {len(resp.content)} bytes")
+            fd = os.open(part_path, os.O_WRONLY)
+            try:
+                os.pwrite(fd, resp.content, start)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            with lock:
+                state["done"].append(index)
+                self._save_state(part_path, state)
+
+        with ThreadPoolExecutor(max_workers=self.parts) as ex:
+            # list() re-raises the first failed range; finished ones stay recorded
+            list(ex.map(_fetch, todo))
+
+
 def download_file(
     taxi_type: str,
     year: int,
     month: str,
     source: str,
     download_dir: str,
+    cache: DownloadCache,
+    downloader: RangedDownloader | None = None,
 ) -> str | None:
+    """
+    Fetch a file through the shared download cache and link it into download_dir.
+
+    A file already in the cache costs no network traffic. Partial downloads from
+    an interrupted run never reach the cache or download_dir, so they are not
+    mistaken for complete files; `downloader` resumes them on the next run.
+    """
     url      = build_url(taxi_type, year, month, source)
     filename = build_filename(taxi_type, year, month, source)
     filepath = os.path.join(download_dir, filename)
 
-    if os.path.exists(filepath):
-        print(f"⏭️  Already exists, skipping download: {filename}")
-        return filepath
+    cached = cache.lookup(url) is not None
+    print(f"{'⏭️  Cached' if cached else '⬇️  Downloading'} {url} ...")
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            cache.materialize(url, filepath, downloader=downloader)
+            size_mb = os.path.getsize(filepath) / 1024 / 1024
+            print(f"✅ {'From cache' if cached else 'Downloaded'}: {filename}  ({size_mb:.1f} MB)")
+            return filepath
+        except Exception as exc:
+            print(f"❌ Failed to download {url} (attempt {attempt}): {exc}")
+            status = getattr(getattr(exc, "response", None), "status_code", None) or getattr(exc, "code", None)
+            if status is not None and 400 <= status < 500 and status not in (408, 429):
+                return None   # e.g. a month TLC has not published; retrying won't help
+        if attempt < MAX_RETRIES:
+            backoff(attempt)
+    return None
+
+
+# ─────────────────────────────────────────────
+# TRANSFORM (csv.gz / parquet → typed, zstd Parquet)
+# ─────────────────────────────────────────────
+def converted_path(download_dir: str, taxi_type: str, year: int, month: str, hive: bool) -> str:
+    """Where --to-parquet writes a file; with `hive`, under year=YYYY/month=MM/."""
+    filename = f"{taxi_type}_tripdata_{year}-{month}.parquet"
+    if hive:
+        return os.path.join(download_dir, f"year={year}", f"month={month}", filename)
+    return os.path.join(download_dir, filename)
+
+
+def is_converted(filepath: str) -> bool:
+    """True if `filepath` is Parquet written by convert_to_parquet() (it carries CONVERTED_MARKER)."""
+    if not filepath.endswith(".parquet") or not os.path.exists(filepath):
+        return False
+    import pyarrow.parquet as pq
 
-    print(f"⬇️  Downloading {url} ...")
     try:
-        urllib.request.urlretrieve(url, filepath)
-        size_mb = os.path.getsize(filepath) / 1024 / 1024
-        print(f"✅ Downloaded: {filename}  ({size_mb:.1f} MB)")
-        return filepath
-    except Exception as exc:
-        print(f"❌ Failed to download {url}: {exc}")
-        # Remove partial file if it exists
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        return None
+        metadata = pq.read_schema(filepath).metadata or {}
+    except Exception:
+        return False   # unreadable: convert (or fail) like any other source
+    return CONVERTED_MARKER in metadata
+
+
+def _iter_source_batches(filepath: str, declared: dict[str, str]):
+    """Yield record batches from a csv.gz or parquet file without loading it whole."""
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    if filepath.endswith(".parquet"):
+        yield from pq.ParquetFile(filepath).iter_batches(batch_size=128 * 1024)
+        return
+    # Integer columns are read as double: older TLC CSVs write them as "1.0".
+    # The later safe cast still fails on genuinely fractional values.
+    types     = arrow_types()
+    csv_types = {name: (pa.float64() if kind in ("smallint", "integer") else types[kind])
+                 for name, kind in declared.items()}
+    reader = pv.open_csv(
+        filepath,
+        read_options=pv.ReadOptions(block_size=16 * 1024 * 1024),
+        convert_options=pv.ConvertOptions(column_types=csv_types, timestamp_parsers=["%Y-%m-%d %H:%M:%S"]),
+    )
+    yield from reader
+
+
+def _normalize_batch(batch: "pa.RecordBatch", declared: dict[str, str]) -> "pa.RecordBatch":
+    """Cast declared columns (matched case-insensitively) and rename pickup/dropoff columns."""
+    import pyarrow as pa
+
+    types   = arrow_types()
+    kinds   = {name.lower(): kind for name, kind in declared.items()}
+    arrays  = []
+    names   = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        kind = kinds.get(name.lower())
+        if kind is not None and column.type != types[kind]:
+            column = column.cast(types[kind])
+        arrays.append(column)
+        names.append(NORMALIZED_NAMES.get(name.lower(), name))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def convert_to_parquet(
+    filepath: str,
+    dest: str,
+    taxi_type: str,
+    row_group_rows: int = ROW_GROUP_ROWS,
+) -> str:
+    """
+    Re-encode a downloaded file as typed, zstd-compressed Parquet at `dest`.
+
+    The source is read batch by batch and written in row groups of
+    `row_group_rows`, so memory stays at about one row group. The output is
+    written to a .part file and renamed into place, then the source is removed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    start    = time.time()
+    declared = TAXI_SCHEMAS[taxi_type]
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    part     = dest + ".part"
+    writer   = None
+    pending, pending_rows, rows, row_groups = [], 0, 0, 0
+
+    def _flush():
+        nonlocal pending, pending_rows, row_groups
+        writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_rows)
+        row_groups += 1
+        pending, pending_rows = [], 0
+
+    try:
+        for batch in _iter_source_batches(filepath, declared):
+            batch = _normalize_batch(batch, declared)
+            if writer is None:
+                schema = batch.schema.with_metadata({**(batch.schema.metadata or {}), CONVERTED_MARKER: b"1"})
+                writer = pq.ParquetWriter(part, schema, compression=PARQUET_COMPRESSION)
+            while batch.num_rows:
+                take = min(batch.num_rows, row_group_rows - pending_rows)
+                pending.append(batch.slice(0, take))
+                pending_rows += take
+                rows         += take
+                batch         = batch.slice(take)
+                if pending_rows == row_group_rows:
+                    _flush()
+        if writer is None:
+            raise ValueError(f"{filepath} has no rows")
+        if pending:
+            _flush()
+        writer.close()
+        os.replace(part, dest)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+    src_mb  = os.path.getsize(filepath) / 1024 / 1024
+    dest_mb = os.path.getsize(dest) / 1024 / 1024
+    if os.path.abspath(filepath) != os.path.abspath(dest):
+        os.remove(filepath)
+    print(f"🔄 Converted {os.path.basename(filepath)} ({src_mb:.1f} MB) → "
+          f"{os.path.basename(dest)} ({dest_mb:.1f} MB, {rows:,} rows, "
+          f"{row_groups} row group(s)) in {time.time() - start:.1f}s")
+    return dest
 
 
 # ─────────────────────────────────────────────
 # UPLOAD
 # ─────────────────────────────────────────────
+def file_checksums(filepath: str) -> tuple[str, str]:
+    """Base64 CRC32C and MD5 of a local file, in the format GCS reports them."""
+    import google_crc32c
+
+    crc = google_crc32c.Checksum()
+    md5 = hashlib.md5()
+    with open(filepath, "rb") as f:
+        while block := f.read(READ_BLOCK_SIZE):
+            crc.update(block)
+            md5.update(block)
+    return base64.b64encode(crc.digest()).decode(), base64.b64encode(md5.digest()).decode()
+
+
+def list_remote(bucket: storage.Bucket, gcs_prefix: str) -> dict[str, storage.Blob]:
+    """Every object under the prefix, from one paginated listing (no per-file requests)."""
+    prefix = f"{gcs_prefix}/" if gcs_prefix else None
+    return {blob.name: blob for blob in bucket.list_blobs(prefix=prefix)}
+
+
 def upload_to_gcs(
     filepath: str,
     bucket: storage.Bucket,
     gcs_prefix: str,
     overwrite: bool,
+    remote: dict[str, storage.Blob] | None = None,
+    relpath: str | None = None,
 ) -> bool:
+    """
+    Upload one file, verified from the upload response.
+
+    The object is named `<gcs_prefix>/<relpath>`; relpath defaults to the file
+    name and carries the year=/month= directories of a Hive-style layout.
+
+    With `remote` (the result of list_remote), the file is skipped when the
+    listed object has the same size and CRC32C (or MD5) as the local copy.
+    Otherwise `overwrite=False` skips any existing object.
+    """
     filename  = os.path.basename(filepath)
-    blob_name = f"{gcs_prefix}/{filename}" if gcs_prefix else filename
+    relpath   = (relpath or filename).replace(os.sep, "/")
+    blob_name = f"{gcs_prefix}/{relpath}" if gcs_prefix else relpath
     blob      = bucket.blob(blob_name)
     blob.chunk_size = CHUNK_SIZE
+    size      = os.path.getsize(filepath)
 
-    if not overwrite and blob.exists():
+    if remote is not None:
+        existing = remote.get(blob_name)
+        if existing is not None and existing.size == size:
+            crc32c, md5 = file_checksums(filepath)
+            if existing.crc32c == crc32c or (existing.md5_hash is not None and existing.md5_hash == md5):
+                print(f"⏭️  Unchanged in GCS, skipping upload: {blob_name}")
+                return True
+    elif not overwrite and blob.exists():
         print(f"⏭️  Already in GCS, skipping upload: {blob_name}")
         return True
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             print(f"⬆️  Uploading {filename} → gs://{bucket.name}/{blob_name}  (attempt {attempt})")
-            blob.upload_from_filename(filepath)
+            # checksum="crc32c" makes the client compare its CRC32C with the one GCS
+            # computed (raising on mismatch) and loads the object metadata from the
+            # upload response, so no follow-up exists()/reload() round-trip is needed.
+            blob.upload_from_filename(filepath, checksum="crc32c")
 
-            if blob.exists():
+            if blob.size == size:
                 size_mb = blob.size / 1024 / 1024
                 print(f"✅ Uploaded: gs://{bucket.name}/{blob_name}  ({size_mb:.1f} MB)")
                 return True
             else:
-                print(f"⚠️  Verification failed for {blob_name}, retrying...")
+                print(f"⚠️  Verification failed for {blob_name} ({blob.size} of {size} bytes), retrying...")
         except Exception as exc:
             print(f"❌ Upload error (attempt {attempt}): {exc}")
-        time.sleep(5 * attempt)   # exponential-ish back-off
+        if attempt < MAX_RETRIES:
+            backoff(attempt)
+
+    print(f"❌ Gave up on {filename} after {MAX_RETRIES} attempts.")
+    return False
+
+
+# ─────────────────────────────────────────────
+# STREAMING (download → GCS with no local file)
+# ─────────────────────────────────────────────
+def stream_buffer_chunks(budget_mb: int, workers: int) -> int:
+    """
+    Queue depth per file so `workers` concurrent streams fit in `budget_mb`.
+
+    Each stream holds its queued chunks plus one being uploaded and one
+    looked ahead (to know which chunk is the last).
+    """
+    per_worker = budget_mb * 1024 * 1024 // max(1, workers)
+    return max(1, per_worker // CHUNK_SIZE - 2)
+
+
+def _read_chunks(resp: requests.Response, chunks: queue.Queue, stop: threading.Event) -> None:
+    """Producer: cut the HTTP body into CHUNK_SIZE pieces; ends with None (or the error)."""
+    try:
+        buf = bytearray()
+        # raw.stream keeps the bytes as served, so the length matches Content-Length
+        for block in resp.raw.stream(READ_BLOCK_SIZE, decode_content=False):
+            buf += block
+            while len(buf) >= CHUNK_SIZE:
+                chunks.put(bytes(buf[:CHUNK_SIZE]))
+                del buf[:CHUNK_SIZE]
+            if stop.is_set():
+                return
+        if buf:
+            chunks.put(bytes(buf))
+        chunks.put(None)
+    except Exception as exc:
+        chunks.put(exc)
+
+
+def _persisted_bytes(resp: requests.Response) -> int:
+    """Bytes GCS has committed, from a 308 response's Range header ('bytes=0-N')."""
+    committed = resp.headers.get("Range")
+    return int(committed.rsplit("-", 1)[1]) + 1 if committed else 0
+
+
+def _put_chunk(
+    session: requests.Session,
+    upload_url: str,
+    chunk: bytes,
+    offset: int,
+    total: int | None,
+) -> dict | None:
+    """
+    Send one chunk of a resumable upload starting at byte `offset`.
+
+    `total` is the object size on the final chunk and None otherwise. After a
+    failed request the session is asked how much it committed and only the
+    remainder of the chunk is resent. Returns the object resource once the
+    upload is finalized, else None.
+    """
+    size = "*" if total is None else str(total)
+    sent = offset
+    for attempt in range(1, MAX_RETRIES + 1):
+        body    = chunk[sent - offset:]
+        headers = {"Content-Range": f"bytes {sent}-{offset + len(chunk) - 1}/{size}" if body
+                   else f"bytes */{size}"}
+        try:
+            resp = session.put(upload_url, data=body, headers=headers, timeout=HTTP_TIMEOUT)
+        except requests.RequestException:
+            resp = None
+
+        if resp is not None and resp.status_code in (200, 201):
+            return resp.json()
+        if resp is not None and resp.status_code == 308:
+            sent = _persisted_bytes(resp)
+            if sent == offset + len(chunk):
+                return None
+            continue
+        if resp is not None and resp.status_code not in (408, 429, 500, 502, 503, 504):
+            resp.raise_for_status()
+
+        # Transient failure: ask the session what it kept, then resend the rest
+        backoff(attempt)
+        try:
+            status = session.put(upload_url, data=b"", headers={"Content-Range": f"bytes */{size}"},
+                                 timeout=HTTP_TIMEOUT)
+        except requests.RequestException:
+            continue
+        if status.status_code in (200, 201):
+            return status.json()
+        if status.status_code == 308:
+            sent = max(offset, _persisted_bytes(status))
+    raise IOError(f"Chunk at byte {offset} not accepted after {MAX_RETRIES} attempts")
+
+
+def _stream_once(url: str, blob: storage.Blob, session: requests.Session, buffer_chunks: int) -> dict:
+    with session.get(url, stream=True, timeout=HTTP_TIMEOUT) as resp:
+        resp.raise_for_status()
+        length = resp.headers.get("Content-Length")
+        total  = int(length) if length and "Content-Encoding" not in resp.headers else None
+        ext    = "csv.gz" if url.endswith(".csv.gz") else "parquet"
+        upload_url = blob.create_resumable_upload_session(content_type=CONTENT_TYPES[ext], size=total)
+
+        chunks   = queue.Queue(maxsize=buffer_chunks)
+        stop     = threading.Event()
+        producer = threading.Thread(target=_read_chunks, args=(resp, chunks, stop), daemon=True)
+        producer.start()
+
+        def _next():
+            item = chunks.get()
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        try:
+            offset, chunk, result = 0, _next(), None
+            if chunk is None:  # empty body: finalize a zero-byte object
+                result = _put_chunk(session, upload_url, b"", 0, 0)
+            while chunk is not None:
+                ahead  = _next()
+                last   = ahead is None
+                result = _put_chunk(session, upload_url, chunk, offset, offset + len(chunk) if last else None)
+                offset += len(chunk)
+                chunk   = ahead
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full queue
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    if result is None or int(result.get("size", -1)) != offset:
+        raise IOError(f"Upload finished with {result and result.get('size')} bytes, streamed {offset}")
+    if total is not None and offset != total:
+        raise IOError(f"Download ended at {offset} of {total} bytes")
+    return result
+
+
+def stream_to_gcs(
+    taxi_type: str,
+    year: int,
+    month: str,
+    source: str,
+    bucket: storage.Bucket,
+    gcs_prefix: str,
+    overwrite: bool,
+    session: requests.Session,
+    buffer_chunks: int,
+) -> bool:
+    """
+    Pipe one file from its source URL straight into a GCS resumable upload.
+
+    A reader thread fills a queue of at most `buffer_chunks` CHUNK_SIZE pieces
+    while the upload drains it, so download and upload overlap and nothing is
+    written to disk. A failed chunk is resumed from the byte GCS last
+    committed; a broken download restarts the file with a new upload session.
+    """
+    url       = build_url(taxi_type, year, month, source)
+    filename  = build_filename(taxi_type, year, month, source)
+    blob_name = f"{gcs_prefix}/{filename}" if gcs_prefix else filename
+    blob      = bucket.blob(blob_name)
+
+    if not overwrite and blob.exists():
+        print(f"⏭️  Already in GCS, skipping: {blob_name}")
+        return True
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            print(f"🔀 Streaming {url} → gs://{bucket.name}/{blob_name}  (attempt {attempt})")
+            start   = time.time()
+            result  = _stream_once(url, blob, session, buffer_chunks)
+            size_mb = int(result["size"]) / 1024 / 1024
+            elapsed = time.time() - start
+            print(f"✅ Streamed: gs://{bucket.name}/{blob_name}  ({size_mb:.1f} MB in {elapsed:.1f}s)")
+            return True
+        except Exception as exc:
+            print(f"❌ Stream error for {filename} (attempt {attempt}): {exc}")
+        if attempt < MAX_RETRIES:
+            backoff(attempt)
 
     print(f"❌ Gave up on {filename} after {MAX_RETRIES} attempts.")
     return False
@@ -254,13 +806,56 @@ Examples
         "--download-dir", default="./data",
         help="Local directory for downloaded files. Default: ./data",
     )
+    p.add_argument(
+        "--cache-dir", default=None,
+        help="Shared download cache directory. Default: $TLC_CACHE_DIR or ~/.cache/tlc",
+    )
     p.add_argument(
         "--gcs-prefix", default="",
         help="Optional folder prefix inside the bucket, e.g. 'raw/green'. Default: bucket root",
     )
     p.add_argument(
         "--workers", type=int, default=4,
-        help="Number of parallel download/upload workers. Default: 4",
+        help="Default for --download-workers/--upload-workers, and the --stream worker count. Default: 4",
+    )
+    p.add_argument(
+        "--download-workers", type=int, default=None,
+        help="Concurrent downloads. Default: --workers",
+    )
+    p.add_argument(
+        "--upload-workers", type=int, default=None,
+        help="Concurrent uploads. Default: --workers",
+    )
+    p.add_argument(
+        "--range-parts", type=int, default=4,
+        help="Concurrent HTTP Range requests per large file (1 = single stream). Default: 4",
+    )
+    p.add_argument(
+        "--to-parquet", action="store_true",
+        help=(
+            "Re-encode each downloaded file as typed, zstd-compressed Parquet with "
+            "pickup_datetime/dropoff_datetime column names before uploading "
+            "(mainly for --source dtc csv.gz)."
+        ),
+    )
+    p.add_argument(
+        "--hive-partitions", action="store_true",
+        help="With --to-parquet, write to year=YYYY/month=MM/ subdirectories (and GCS paths).",
+    )
+    p.add_argument(
+        "--row-group-rows", type=int, default=ROW_GROUP_ROWS,
+        help=f"Rows per Parquet row group with --to-parquet. Default: {ROW_GROUP_ROWS:,}",
+    )
+    p.add_argument(
+        "--stream", action="store_true",
+        help=(
+            "Pipe each download straight into a resumable GCS upload. Nothing is "
+            "written to --download-dir or the download cache."
+        ),
+    )
+    p.add_argument(
+        "--stream-buffer-mb", type=int, default=STREAM_BUFFER_MB,
+        help=f"Memory budget for --stream across all workers, in MB. Default: {STREAM_BUFFER_MB}",
     )
     p.add_argument(
         "--credentials", default=None,
@@ -278,6 +873,13 @@ Examples
         "--no-overwrite", action="store_true",
         help="Do not re-upload files that already exist in GCS.",
     )
+    p.add_argument(
+        "--sync", action="store_true",
+        help=(
+            "List --gcs-prefix once and upload only files whose size or CRC32C/MD5 "
+            "differs from the object already there."
+        ),
+    )
     p.add_argument(
         "--keep-local", action="store_true",
         help="Keep local files after uploading. By default they are deleted to save space.",
@@ -302,6 +904,22 @@ def main() -> None:
     years  = parse_int_list(args.years, "years", VALID_YEARS)
     months = parse_month_list(args.months)
 
+    args.download_workers = args.download_workers or args.workers
+    args.upload_workers   = args.upload_workers or args.workers
+
+    if args.stream and (args.skip_download or args.skip_upload):
+        print("❌ --stream cannot be combined with --skip-download or --skip-upload.")
+        sys.exit(1)
+    if args.stream and args.to_parquet:
+        print("❌ --to-parquet needs the downloaded file; it cannot be combined with --stream.")
+        sys.exit(1)
+    if args.hive_partitions and not args.to_parquet:
+        print("❌ --hive-partitions only applies with --to-parquet.")
+        sys.exit(1)
+    if args.sync and (args.stream or args.skip_upload):
+        print("❌ --sync needs local files to compare; it cannot be combined with --stream or --skip-upload.")
+        sys.exit(1)
+
     # The DTC mirror only has CSV.GZ; warn the user if they select tlc
     # (tlc only has parquet — that's already enforced by the URL templates)
 
@@ -314,16 +932,25 @@ def main() -> None:
     print(f"  Source      : {args.source}  ({'parquet' if args.source == 'tlc' else 'csv.gz'})")
     print(f"  Bucket      : {args.bucket}")
     print(f"  GCS prefix  : '{args.gcs_prefix}' (empty = bucket root)")
-    print(f"  Download dir: {args.download_dir}")
-    print(f"  Workers     : {args.workers}")
-    print(f"  Overwrite   : {not args.no_overwrite}")
+    if args.stream:
+        print(f"  Mode        : stream  (≤ {args.stream_buffer_mb} MB buffered, no local files)")
+    else:
+        print(f"  Download dir: {args.download_dir}")
+        print(f"  Cache dir   : {args.cache_dir or os.environ.get('TLC_CACHE_DIR') or '~/.cache/tlc'}")
+    if args.stream:
+        print(f"  Workers     : {args.workers}")
+    else:
+        print(f"  Workers     : {args.download_workers} download (x{args.range_parts} ranges per file), "
+              f"{args.upload_workers} upload")
+    if args.to_parquet:
+        print(f"  Transform   : → parquet ({PARQUET_COMPRESSION}, {args.row_group_rows:,} rows/group"
+              f"{', year=/month= partitions' if args.hive_partitions else ''})")
+    print(f"  Overwrite   : {'changed files only (--sync)' if args.sync else not args.no_overwrite}")
     print(f"  Keep local  : {args.keep_local}")
     total = len(taxi_types) * len(years) * len(months)
     print(f"  Total files : {total}")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n")
 
-    os.makedirs(args.download_dir, exist_ok=True)
-
     # ── Build all (taxi_type, year, month) combos ──────────────────────────
     tasks = list(product(taxi_types, years, months))
 
@@ -333,53 +960,110 @@ def main() -> None:
         client = build_client(args.credentials)
         bucket = ensure_bucket(client, args.bucket)
 
-    # ── PHASE 1: Download ──────────────────────────────────────────────────
-    local_files: list[str] = []
+    # ── STREAM: download and upload in one pass ────────────────────────────
+    if args.stream:
+        buffer_chunks = stream_buffer_chunks(args.stream_buffer_mb, args.workers)
+        session       = build_session(pool_size=args.workers * 2)
+        overwrite     = not args.no_overwrite
+        print(f"🔀 Streaming {total} file(s) with {args.workers} workers "
+              f"({buffer_chunks} x {CHUNK_SIZE // 1024 // 1024} MB buffered per file)...\n")
 
-    if args.skip_download:
-        print("⏭️  --skip-download set; collecting already-downloaded files...\n")
-        for taxi_type, year, month in tasks:
-            filename = build_filename(taxi_type, year, month, args.source)
-            filepath = os.path.join(args.download_dir, filename)
-            if os.path.exists(filepath):
-                local_files.append(filepath)
-            else:
-                print(f"⚠️  File not found locally, will be skipped: {filename}")
-    else:
-        print(f"⬇️  Downloading {total} file(s) with {args.workers} workers...\n")
-
-        def _download(task):
+        def _stream(task):
             taxi_type, year, month = task
-            return download_file(taxi_type, year, month, args.source, args.download_dir)
+            return stream_to_gcs(taxi_type, year, month, args.source, bucket, args.gcs_prefix,
+                                 overwrite, session, buffer_chunks)
 
         with ThreadPoolExecutor(max_workers=args.workers) as ex:
-            results = list(ex.map(_download, tasks))
+            results = list(ex.map(_stream, tasks))
+
+        print(f"\n✅ Stream phase: {results.count(True)} succeeded, {results.count(False)} failed.")
+        print("\n🚀 Done.\n")
+        return
+
+    os.makedirs(args.download_dir, exist_ok=True)
 
-        local_files = [f for f in results if f is not None]
-        failed_dl   = total - len(local_files)
-        print(f"\n✅ Download phase: {len(local_files)} succeeded, {failed_dl} failed.\n")
+    # ── Download → upload pipeline ─────────────────────────────────────────
+    # Each file is handed to the upload pool as soon as its own download
+    # finishes, so one slow month never holds back the others' uploads.
+    overwrite = not args.no_overwrite
+    remote    = None
+    if args.sync:
+        remote = list_remote(bucket, args.gcs_prefix)
+        print(f"🔎 Listed {len(remote)} object(s) under gs://{bucket.name}/{args.gcs_prefix}\n")
+
+    def _upload(fp):
+        relpath = os.path.relpath(fp, args.download_dir)
+        success = upload_to_gcs(fp, bucket, args.gcs_prefix, overwrite, remote, relpath)
+        if success and not args.keep_local:
+            os.remove(fp)
+            print(f"🗑️  Deleted local file: {os.path.basename(fp)}")
+        return success
+
+    downloaded, failed_dl = 0, 0
+    upload_futures = []
+    with ThreadPoolExecutor(max_workers=args.upload_workers) as upload_pool:
+        def _queue_upload(fp):
+            if not args.skip_upload:
+                upload_futures.append(upload_pool.submit(_upload, fp))
+
+        if args.skip_download:
+            print("⏭️  --skip-download set; uploading already-downloaded files...\n")
+            for taxi_type, year, month in tasks:
+                filename = build_filename(taxi_type, year, month, args.source)
+                filepath = os.path.join(args.download_dir, filename)
+                if args.to_parquet:
+                    # With --source tlc and no --hive-partitions the converted file has the
+                    # original's name, so look inside rather than at the path
+                    converted = converted_path(args.download_dir, taxi_type, year, month, args.hive_partitions)
+                    if is_converted(converted):
+                        filepath = converted
+                    elif os.path.exists(filepath):
+                        try:
+                            filepath = convert_to_parquet(filepath, converted, taxi_type, args.row_group_rows)
+                        except Exception as exc:
+                            print(f"❌ Failed to convert {filename}: {exc}")
+                            continue
+                if os.path.exists(filepath):
+                    _queue_upload(filepath)
+                else:
+                    print(f"⚠️  File not found locally, will be skipped: {filename}")
+        else:
+            print(f"⬇️  Downloading {total} file(s) with {args.download_workers} workers"
+                  f"{'' if args.skip_upload else f', uploading with {args.upload_workers}'}...\n")
+            cache      = DownloadCache(args.cache_dir)
+            session    = build_session(pool_size=args.download_workers * max(1, args.range_parts))
+            downloader = RangedDownloader(session, parts=args.range_parts)
+
+            def _download(task):
+                taxi_type, year, month = task
+                filepath = download_file(taxi_type, year, month, args.source, args.download_dir, cache, downloader)
+                if filepath is None or not args.to_parquet:
+                    return filepath
+                dest = converted_path(args.download_dir, taxi_type, year, month, args.hive_partitions)
+                try:
+                    return convert_to_parquet(filepath, dest, taxi_type, args.row_group_rows)
+                except Exception as exc:
+                    print(f"❌ Failed to convert {os.path.basename(filepath)}: {exc}")
+                    return None
+
+            with ThreadPoolExecutor(max_workers=args.download_workers) as download_pool:
+                for future in as_completed([download_pool.submit(_download, t) for t in tasks]):
+                    filepath = future.result()
+                    if filepath is None:
+                        failed_dl += 1
+                    else:
+                        downloaded += 1
+                        _queue_upload(filepath)
+
+            print(f"\n✅ Downloads: {downloaded} succeeded, {failed_dl} failed.\n")
 
-    # ── PHASE 2: Upload ────────────────────────────────────────────────────
     if args.skip_upload:
         print("⏭️  --skip-upload set; skipping GCS upload.")
-    elif not local_files:
+    elif not upload_futures:
         print("⚠️  No local files to upload.")
     else:
-        print(f"⬆️  Uploading {len(local_files)} file(s) with {args.workers} workers...\n")
-        overwrite = not args.no_overwrite
-
-        def _upload(fp):
-            success = upload_to_gcs(fp, bucket, args.gcs_prefix, overwrite)
-            if success and not args.keep_local:
-                os.remove(fp)
-                print(f"🗑️  Deleted local file: {os.path.basename(fp)}")
-            return success
-
-        with ThreadPoolExecutor(max_workers=args.workers) as ex:
-            upload_results = list(ex.map(_upload, local_files))
-
-        failed_ul = upload_results.count(False)
-        print(f"\n✅ Upload phase: {upload_results.count(True)} succeeded, {failed_ul} failed.")
+        upload_results = [f.result() for f in upload_futures]
+        print(f"\n✅ Uploads: {upload_results.count(True)} succeeded, {upload_results.count(False)} failed.")
 
     print("\n🚀 Done.\n")
 
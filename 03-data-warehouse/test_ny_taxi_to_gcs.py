@@ -0,0 +1,349 @@
+"""
+Tests for RangedDownloader against a local HTTP server that honours Range,
+and for the --stream upload against a fake GCS resumable session.
+
+    pytest 03-data-warehouse/test_ny_taxi_to_gcs.py
+"""
+
+import os
+import re
+import json
+import threading
+import http.server
+
+import pytest
+import requests
+
+import ny_taxi_to_gcs
+from ny_taxi_to_gcs import RangedDownloader
+
+
+PAYLOAD   = bytes(range(256)) * 1200   # 300 KiB
+PART_SIZE = 64 * 1024
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set per test through the `server` fixture
+    gets: list = []
+    cut_get: int | None = None        # GET number (1-based) whose body is cut short
+    fail_get: int | None = None       # GET number answered with 503
+    refuse_ranges = False             # answer every Range GET with 416
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, code: int, length: int, extra: dict | None = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", '"v1"')
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(PAYLOAD))
+
+    def do_GET(self):
+        cls = type(self)
+        rng = self.headers.get("Range")
+        cls.gets.append(rng)
+        number = len(cls.gets)
+        if number == cls.fail_get:
+            self._headers(503, 0, {"Connection": "close"})
+            return
+        if rng and cls.refuse_ranges:
+            self._headers(416, 0, {"Content-Range": f"bytes */{len(PAYLOAD)}"})
+            return
+
+        start, end, code = 0, len(PAYLOAD) - 1, 200
+        if rng:
+            m = re.match(r"bytes=(\d+)-(\d*)", rng)
+            start, code = int(m.group(1)), 206
+            end = int(m.group(2)) if m.group(2) else len(PAYLOAD) - 1
+            if start >= len(PAYLOAD):
+                self._headers(416, 0, {"Content-Range": f"bytes */{len(PAYLOAD)}"})
+                return
+        body = PAYLOAD[start:end + 1]
+        extra = {"Content-Range": f"bytes {start}-{end}/{len(PAYLOAD)}"} if code == 206 else {}
+        if number == cls.cut_get:
+            # Promise the whole body, send half of it and hang up
+            self._headers(code, len(body), {**extra, "Connection": "close"})
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._headers(code, len(body), extra)
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (RangeHandler,), {"gets": []})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}/green_tripdata_2024-01.parquet"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def part_path(tmp_path, monkeypatch):
+    # Small blocks, so a cut-short response leaves bytes in the part file
+    monkeypatch.setattr(ny_taxi_to_gcs, "READ_BLOCK_SIZE", 4096)
+    return str(tmp_path / "file.part")
+
+
+def downloader(parts: int) -> RangedDownloader:
+    # No urllib3 retries: every failure should reach the resume logic
+    return RangedDownloader(requests.Session(), parts=parts, part_size=PART_SIZE)
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_stream_resumes_after_interruption(server, part_path):
+    handler, url = server
+    handler.cut_get = 1
+    with pytest.raises(requests.RequestException):
+        downloader(parts=1)(url, part_path)
+    partial = os.path.getsize(part_path)
+    assert 0 < partial < len(PAYLOAD)
+
+    meta = downloader(parts=1)(url, part_path)
+    assert meta["size"] == len(PAYLOAD)
+    assert read(part_path) == PAYLOAD
+    assert handler.gets == [None, f"bytes={partial}-"]
+    assert not os.path.exists(part_path + ".ranges")
+
+
+def test_ranges_resume_only_missing_pieces(server, part_path):
+    handler, url = server
+    handler.fail_get = 2
+    with pytest.raises(requests.HTTPError):
+        downloader(parts=2)(url, part_path)
+    with open(part_path + ".ranges") as f:
+        done = json.load(f)["done"]
+    assert done
+
+    handler.gets.clear()
+    handler.fail_get = None
+    downloader(parts=2)(url, part_path)
+    assert read(part_path) == PAYLOAD
+    assert len(handler.gets) == len(PAYLOAD) // PART_SIZE + 1 - len(done)
+
+
+def test_switch_from_ranges_to_stream_restarts(server, part_path):
+    handler, url = server
+    handler.fail_get = 2
+    with pytest.raises(requests.HTTPError):
+        downloader(parts=2)(url, part_path)
+    # The ranged part is pre-sized, so its length is not a resume offset
+    assert os.path.getsize(part_path) == len(PAYLOAD)
+
+    handler.gets.clear()
+    downloader(parts=1)(url, part_path)
+    assert read(part_path) == PAYLOAD
+    assert handler.gets == [None]
+
+
+def test_switch_from_stream_to_ranges_restarts(server, part_path):
+    handler, url = server
+    handler.cut_get = 1
+    with pytest.raises(requests.RequestException):
+        downloader(parts=1)(url, part_path)
+
+    handler.gets.clear()
+    handler.cut_get = None
+    downloader(parts=2)(url, part_path)
+    assert read(part_path) == PAYLOAD
+    assert sorted(handler.gets, key=lambda r: int(r.split("=")[1].split("-")[0])) == [
+        f"bytes={start}-{min(start + PART_SIZE, len(PAYLOAD)) - 1}"
+        for start in range(0, len(PAYLOAD), PART_SIZE)
+    ]
+
+
+def test_complete_part_with_leftover_sidecar_skips_get(server, part_path):
+    handler, url = server
+    # A run killed after the stream finished but before the sidecar was removed
+    with open(part_path, "wb") as f:
+        f.write(PAYLOAD)
+    with open(part_path + ".ranges", "w") as f:
+        json.dump({"etag": '"v1"', "size": len(PAYLOAD), "part_size": PART_SIZE,
+                   "mode": "stream", "done": []}, f)
+
+    meta = downloader(parts=1)(url, part_path)
+    assert meta["size"] == len(PAYLOAD)
+    assert read(part_path) == PAYLOAD
+    assert handler.gets == []
+    assert not os.path.exists(part_path + ".ranges")
+
+
+def test_416_discards_part_and_restarts(server, part_path):
+    handler, url = server
+    handler.cut_get = 1
+    with pytest.raises(requests.RequestException):
+        downloader(parts=1)(url, part_path)
+    partial = os.path.getsize(part_path)
+
+    handler.refuse_ranges = True
+    downloader(parts=1)(url, part_path)
+    assert read(part_path) == PAYLOAD
+    assert handler.gets[1:] == [f"bytes={partial}-", None]
+
+
+# ─────────────────────────────────────────────
+# --stream: resumable upload against a fake GCS session
+# ─────────────────────────────────────────────
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict | None = None, body: bytes = b"", payload=None):
+        self.status_code = status_code
+        self.headers     = headers or {}
+        self.raw         = self
+        self._body       = body
+        self._payload    = payload
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def stream(self, amt, decode_content=False):
+        for i in range(0, len(self._body), amt):
+            yield self._body[i:i + amt]
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+
+class FakeUploadSession:
+    """
+    Serves the source file on GET and acts as a GCS resumable session on PUT.
+
+    `commit` maps a PUT number (1-based) to how many of its bytes are kept;
+    `fail` lists PUT numbers answered with 503 after that commit. Every PUT
+    that carries data must start at the committed offset.
+    """
+
+    def __init__(self, source: bytes, commit: dict | None = None, fail: tuple = ()):
+        self.source = source
+        self.commit = commit or {}
+        self.fail   = set(fail)
+        self.stored = bytearray()
+        self.puts: list[tuple[str, int]] = []
+
+    def get(self, url, stream=False, timeout=None):
+        return FakeResponse(200, {"Content-Length": str(len(self.source))}, body=self.source)
+
+    def put(self, url, data=b"", headers=None, timeout=None):
+        content_range = headers["Content-Range"]
+        self.puts.append((content_range, len(data)))
+        m = re.fullmatch(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", content_range)
+        if m.group(1) is not None:
+            assert int(m.group(1)) == len(self.stored), "PUT does not resume at the committed offset"
+            self.stored += data[:self.commit.get(len(self.puts), len(data))]
+        if len(self.puts) in self.fail:
+            return FakeResponse(503)
+        if m.group(2) != "*" and len(self.stored) == int(m.group(2)):
+            return FakeResponse(200, payload={"size": str(len(self.stored))})
+        return FakeResponse(308, {"Range": f"bytes=0-{len(self.stored) - 1}"} if self.stored else {})
+
+
+class FakeBlob:
+    def create_resumable_upload_session(self, content_type=None, size=None):
+        return "https://storage.example/upload?upload_id=1"
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(ny_taxi_to_gcs, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(ny_taxi_to_gcs, "READ_BLOCK_SIZE", 256)
+    monkeypatch.setattr(ny_taxi_to_gcs, "backoff", lambda attempt: None)
+
+
+SOURCE = bytes(range(256)) * 10   # 2560 bytes: chunks of 1000, 1000 and 560
+
+
+def stream(session: FakeUploadSession) -> dict:
+    return ny_taxi_to_gcs._stream_once("https://example/green_tripdata_2024-01.parquet",
+                                       FakeBlob(), session, buffer_chunks=2)
+
+
+def test_stream_final_put_carries_total_size(small_chunks):
+    session = FakeUploadSession(SOURCE)
+    result  = stream(session)
+    assert result["size"] == str(len(SOURCE))
+    assert bytes(session.stored) == SOURCE
+    assert session.puts == [("bytes 0-999/*", 1000), ("bytes 1000-1999/*", 1000), ("bytes 2000-2559/2560", 560)]
+
+
+def test_stream_resends_from_partial_commit(small_chunks):
+    # The 308 for the second chunk commits only 400 of its bytes
+    session = FakeUploadSession(SOURCE, commit={2: 400})
+    stream(session)
+    assert bytes(session.stored) == SOURCE
+    assert session.puts[1:3] == [("bytes 1000-1999/*", 1000), ("bytes 1400-1999/*", 600)]
+
+
+def test_stream_resumes_after_503(small_chunks):
+    # The second chunk fails half-way; the session is queried and the rest resent
+    session = FakeUploadSession(SOURCE, commit={2: 300}, fail=(2,))
+    result  = stream(session)
+    assert result["size"] == str(len(SOURCE))
+    assert bytes(session.stored) == SOURCE
+    assert session.puts[1:4] == [("bytes 1000-1999/*", 1000), ("bytes */*", 0), ("bytes 1300-1999/*", 700)]
+    assert session.puts[-1] == ("bytes 2000-2559/2560", 560)
+
+
+# ─────────────────────────────────────────────
+# --skip-download --to-parquet
+# ─────────────────────────────────────────────
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "01-docker-terraform",
+                      "green_tripdata_2025-11.parquet")
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr("sys.argv", ["ny_taxi_to_gcs.py", "--bucket", "unused", *argv])
+    ny_taxi_to_gcs.main()
+
+
+def codecs(path: str) -> set[str]:
+    import pyarrow.parquet as pq
+
+    meta = pq.ParquetFile(path).metadata
+    return {meta.row_group(i).column(j).compression
+            for i in range(meta.num_row_groups) for j in range(meta.num_columns)}
+
+
+def test_skip_download_converts_tlc_file_in_place(tmp_path, monkeypatch, capsys):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # --source tlc without --hive-partitions: the converted file keeps the original's name
+    path = tmp_path / "green_tripdata_2024-11.parquet"
+    pq.write_table(pq.read_table(SAMPLE), path, compression="snappy")
+    assert pq.read_schema(path).field("VendorID").type != pa.int16()
+    argv = ["--taxi-types", "green", "--years", "2024", "--months", "11", "--source", "tlc",
+            "--download-dir", str(tmp_path), "--skip-download", "--skip-upload", "--to-parquet"]
+
+    run_main(monkeypatch, *argv)
+    assert "Converted" in capsys.readouterr().out
+    assert codecs(str(path)) == {"ZSTD"}
+    assert pq.read_schema(path).field("VendorID").type == pa.int16()
+    assert ny_taxi_to_gcs.is_converted(str(path))
+    assert pq.read_metadata(path).num_rows == pq.read_metadata(SAMPLE).num_rows
+
+    # A rerun finds the marker and leaves the file alone
+    mtime = os.path.getmtime(path)
+    run_main(monkeypatch, *argv)
+    assert "Converted" not in capsys.readouterr().out
+    assert os.path.getmtime(path) == mtime
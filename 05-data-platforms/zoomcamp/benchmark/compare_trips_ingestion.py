@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmark the two ways the ingestion.trips asset can load a run window:
+
+  materialize  materialize() collected to pandas and appended to DuckDB,
+               as Bruin's Python materialization loader does
+  direct       write_duckdb(), the plain-Python mode (Arrow straight into
+               DuckDB, window replaced in one transaction)
+
+Every load runs in its own process, so the peak RSS reported is that
+mode's alone. Each mode gets its own database and is run --runs times over
+the same window; the table row count after each run shows whether a re-run
+replaces the window or appends it again.
+
+Months are read through the shared TLC download cache. --local seeds it
+from TLC-named files on disk (default: the 2025-11 green sample in
+01-docker-terraform), so the benchmark needs no network:
+
+    python compare_trips_ingestion.py
+    python compare_trips_ingestion.py --local green_tripdata_2025-10.parquet green_tripdata_2025-11.parquet \\
+        --start 2025-10-01 --end 2025-12-01
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import importlib.util
+
+
+HERE     = os.path.dirname(os.path.abspath(__file__))
+ASSET    = os.path.join(HERE, '..', 'pipeline', 'assets', 'ingestion', 'trips.py')
+SHARED   = os.path.join(HERE, '..', '..', '..', 'shared')
+SAMPLE   = os.path.join(HERE, '..', '..', '..', '01-docker-terraform', 'green_tripdata_2025-11.parquet')
+BASE_URL = 'https://d37ci6vzurychx.cloudfront.net/trip-data/'
+
+
+def seed_cache(cache_dir, files):
+    """Register local TLC-named files in the download cache under their CloudFront URLs."""
+    sys.path.insert(0, SHARED)
+    from tlc_cache import DownloadCache
+
+    cache = DownloadCache(cache_dir)
+    for path in files:
+        def copy(url, part, path=path):
+            shutil.copyfile(path, part)
+            return {'size': os.path.getsize(part)}
+        cache.fetch(BASE_URL + os.path.basename(path), downloader=copy)
+
+
+def run_child(mode, db_path):
+    """Load the window with one mode; prints one JSON result line."""
+    spec = importlib.util.spec_from_file_location('trips_asset', ASSET)
+    asset = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(asset)
+    import duckdb
+
+    started = time.perf_counter()
+    if mode == 'direct':
+        rows = asset.write_duckdb(db_path)
+    else:
+        import pandas as pd
+        df = pd.concat([table.to_pandas() for table in asset.materialize()], ignore_index=True)
+        con = duckdb.connect(db_path)
+        con.execute('CREATE SCHEMA IF NOT EXISTS ingestion')
+        con.execute('CREATE TABLE IF NOT EXISTS ingestion.trips AS SELECT * FROM df LIMIT 0')
+        con.execute('INSERT INTO ingestion.trips BY NAME SELECT * FROM df')
+        con.close()
+        rows = len(df)
+    seconds = time.perf_counter() - started
+
+    with duckdb.connect(db_path, read_only=True) as con:
+        table_rows = con.sql('SELECT COUNT(*) FROM ingestion.trips').fetchone()[0]
+    print('RESULT ' + json.dumps({
+        'rows': rows,
+        'seconds': round(seconds, 2),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+        'table_rows': table_rows,
+    }))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare materialize() and write_duckdb() for ingestion.trips')
+    parser.add_argument('--start', default='2025-11-01', help='BRUIN_START_DATE (default: 2025-11-01)')
+    parser.add_argument('--end', default='2025-12-01', help='BRUIN_END_DATE, exclusive (default: 2025-12-01)')
+    parser.add_argument('--taxi-types', nargs='+', default=['green'])
+    parser.add_argument('--local', nargs='+', default=[SAMPLE],
+                        help='TLC-named Parquet files to seed the cache with (default: the green sample)')
+    parser.add_argument('--cache-dir', default=None, help='download cache to use (default: a temporary one)')
+    parser.add_argument('--modes', nargs='+', choices=['materialize', 'direct'], default=['materialize', 'direct'])
+    parser.add_argument('--runs', type=int, default=2, help='loads of the same window per mode (default: 2)')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        raise SystemExit(0)
+
+    work_dir = tempfile.mkdtemp(prefix='trips-ingestion-')
+    cache_dir = args.cache_dir or os.path.join(work_dir, 'cache')
+    try:
+        seed_cache(cache_dir, args.local)
+        env = {
+            **os.environ,
+            'TLC_CACHE_DIR': cache_dir,
+            'BRUIN_START_DATE': args.start,
+            'BRUIN_END_DATE': args.end,
+            'BRUIN_START_DATETIME': f'{args.start}T00:00:00',
+            'BRUIN_END_DATETIME': f'{args.end}T00:00:00',
+            'BRUIN_VARS': json.dumps({'taxi_types': args.taxi_types}),
+        }
+        print(f'window [{args.start}, {args.end}), taxi types {", ".join(args.taxi_types)}')
+        for mode in args.modes:
+            db_path = os.path.join(work_dir, f'{mode}.db')
+            for run in range(1, args.runs + 1):
+                proc = subprocess.run([sys.executable, __file__, '--child', mode, db_path],
+                                      env=env, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    sys.stderr.write(proc.stdout[-2000:] + proc.stderr[-4000:])
+                    raise SystemExit(f'{mode} run {run} failed with exit code {proc.returncode}')
+                result = json.loads(proc.stdout.rsplit('RESULT ', 1)[1])
+                print(f'{mode:<12} run {run}: {result["rows"]:>10,} rows {result["seconds"]:>7.2f}s  '
+                      f'peak RSS {result["peak_rss_mb"]:>5} MB  table rows {result["table_rows"]:,}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
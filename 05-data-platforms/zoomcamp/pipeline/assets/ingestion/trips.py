@@ -30,6 +30,13 @@ materialization:
   # suggested strategy: append
   strategy: append
 
+# Direct-write alternative: delete the `materialization:` block above and uncomment `secrets:`.
+# Bruin then runs this file as a plain script, and write_duckdb() loads the window straight
+# into ingestion.trips (delete window + insert, in one transaction) without a pandas hop.
+# secrets:
+#   - key: duckdb-default
+#     inject_as: DUCKDB_CONNECTION
+
 # TODO: Define output columns (names + types) for metadata, lineage, and quality checks.
 # Tip: mark stable identifiers as `primary_key: true` if you plan to use `merge` later.
 # Docs: https://getbruin.com/docs/bruin/assets/columns
@@ -63,16 +70,117 @@ def materialize():
     - Add a column like `extracted_at` for lineage/debugging (timestamp of extraction).
     - Prefer append-only in ingestion; handle duplicates in staging.
     """
+    yield from _trip_tables(_run_window())
+
+
+def _run_window() -> dict:
+    """Read the run window and pipeline variables Bruin passes in the environment."""
     import os
     import json
-    import tempfile
+
+    import numpy as np
+
+    # Read pipeline/window variables from environment
+    start_date = os.environ.get("BRUIN_START_DATE")
+    end_date = os.environ.get("BRUIN_END_DATE")
+    if not start_date or not end_date:
+      raise RuntimeError("BRUIN_START_DATE and BRUIN_END_DATE must be provided in the environment")
+
+    bruin_vars = os.environ.get("BRUIN_VARS", "{}")
+    try:
+      vars_json = json.loads(bruin_vars) if bruin_vars else {}
+    except Exception:
+      vars_json = {}
+
+    return {
+      "start_date": start_date,
+      "end_date": end_date,
+      # Staging keeps pickup_datetime in [start, end); rows outside it are dropped here
+      "window_start": np.datetime64(os.environ.get("BRUIN_START_DATETIME") or start_date, "us"),
+      "window_end": np.datetime64(os.environ.get("BRUIN_END_DATETIME") or end_date, "us"),
+      "taxi_types": vars_json.get("taxi_types") or ["yellow"],
+      # Columns to load, by their normalised names (empty = all columns)
+      "wanted": set(vars_json.get("ingest_columns") or []),
+    }
+
+
+def _trip_tables(window: dict):
+    """Yield normalised, window-filtered Arrow tables for every month in the run window."""
+    import os
+    import sys
     import datetime
-    from typing import List
+    import urllib.error
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from typing import Iterator, List
 
-    import pandas as pd
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
     import requests
 
     BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data/"
+    FETCH_WORKERS = 4           # months downloaded concurrently (and held in memory at most)
+    BATCH_ROWS = 256 * 1024     # rows per yielded Arrow table
+
+    # Shared TLC download cache from /shared at the repo root, so re-runs (and the
+    # other ingestion scripts) reuse files already downloaded. Bruin may run the
+    # asset outside the repo checkout, in which case we download directly.
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), *[".."] * 5, "shared"))
+    try:
+      from tlc_cache import DownloadCache
+      cache = DownloadCache()
+    except ImportError:
+      cache = None
+
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+
+    def _open_month(url: str) -> pq.ParquetFile | None:
+      if cache is not None:
+        try:
+          return pq.ParquetFile(cache.fetch(url))
+        except urllib.error.HTTPError as exc:
+          print(f"[ingest] skipping {url}: status {exc.code}")
+          return None
+      resp = session.get(url, timeout=30)
+      if resp.status_code != 200:
+        # skip missing months
+        print(f"[ingest] skipping {url}: status {resp.status_code}")
+        return None
+      # Parse the Parquet footer and pages straight from the response bytes
+      return pq.ParquetFile(pa.BufferReader(resp.content))
+
+    # TLC renamed and retyped columns over the years (tpep_/lpep_ prefixes,
+    # Airport_fee, int32 vs int64 ids). Batches from different months must share
+    # one schema, so names are normalised and integers widened to int64.
+    renames = {
+      "tpep_pickup_datetime": "pickup_datetime", "lpep_pickup_datetime": "pickup_datetime",
+      "tpep_dropoff_datetime": "dropoff_datetime", "lpep_dropoff_datetime": "dropoff_datetime",
+      "Airport_fee": "airport_fee",
+    }
+
+    def _normalize(batch: pa.RecordBatch, extracted_at: np.datetime64, fname: str, taxi: str) -> pa.Table:
+      columns, names = [], []
+      for name, col in zip(batch.schema.names, batch.columns):
+        if pa.types.is_integer(col.type):
+          col = col.cast(pa.int64())
+        elif pa.types.is_timestamp(col.type):
+          col = col.cast(pa.timestamp("us"))
+        columns.append(col)
+        names.append(renames.get(name, name))
+      n = batch.num_rows
+      # Lineage columns: one vectorised timestamp array and a one-entry dictionary
+      # (n int32 indices) instead of n Python strings per batch.
+      columns.append(pa.array(np.full(n, extracted_at), type=pa.timestamp("us")))
+      names.append("extracted_at")
+      indices = pa.array(np.zeros(n, dtype=np.int32))
+      columns.append(pa.DictionaryArray.from_arrays(indices, pa.array([fname])))
+      names.append("_source_file")
+      columns.append(pa.DictionaryArray.from_arrays(indices, pa.array([taxi])))
+      names.append("taxi_type")
+      return pa.Table.from_arrays(columns, names=names)
 
     def _iter_months(start_date: str, end_date: str):
       # Yield (year, month) for each month where year-month >= start_date and < end_date
@@ -87,56 +195,159 @@ def materialize():
         else:
           cur = cur.replace(month=cur.month + 1)
 
-    # Read pipeline/window variables from environment
-    start_date = os.environ.get("BRUIN_START_DATE")
-    end_date = os.environ.get("BRUIN_END_DATE")
-    if not start_date or not end_date:
-      raise RuntimeError("BRUIN_START_DATE and BRUIN_END_DATE must be provided in the environment")
+    taxi_types: List[str] = window["taxi_types"]
+    wanted = window["wanted"]
+    window_start, window_end = window["window_start"], window["window_end"]
+    fnames = [
+      (taxi, f"{taxi}_tripdata_{year}-{month:02d}.parquet")
+      for taxi in taxi_types
+      for year, month in _iter_months(window["start_date"], window["end_date"])
+    ]
+    extracted_at = np.datetime64(datetime.datetime.utcnow(), "us")
 
-    bruin_vars = os.environ.get("BRUIN_VARS", "{}")
-    try:
-      vars_json = json.loads(bruin_vars) if bruin_vars else {}
-    except Exception:
-      vars_json = {}
+    def _plan(pf: pq.ParquetFile) -> tuple[list[int], list[str] | None, int, int]:
+      """
+      Pick the row groups whose pickup_datetime min/max overlap the window and
+      the physical columns to read. Returns them with the compressed bytes the
+      read covers and the file's total.
+      """
+      md = pf.metadata
+      physical = pf.schema_arrow.names
+      pickup = next((i for i, c in enumerate(physical) if renames.get(c, c) == "pickup_datetime"), None)
+      columns = None
+      if wanted:
+        # pickup_datetime is always read: the window filter needs it
+        columns = [c for i, c in enumerate(physical) if renames.get(c, c) in wanted or i == pickup]
+      row_groups, read_bytes, total_bytes = [], 0, 0
+      for i in range(md.num_row_groups):
+        rg = md.row_group(i)
+        chunks = [rg.column(j) for j in range(rg.num_columns)]
+        total_bytes += sum(c.total_compressed_size for c in chunks)
+        stats = chunks[pickup].statistics if pickup is not None else None
+        if stats is not None and stats.has_min_max:
+          lo, hi = np.datetime64(stats.min, "us"), np.datetime64(stats.max, "us")
+          if hi < window_start or lo >= window_end:
+            continue
+        row_groups.append(i)
+        read_bytes += sum(c.total_compressed_size for c in chunks
+                          if columns is None or c.path_in_schema in columns)
+      return row_groups, columns, read_bytes, total_bytes
 
-    taxi_types: List[str] = vars_json.get("taxi_types") or ["yellow"]
+    def _fetch(fname: str) -> pq.ParquetFile | None:
+      try:
+        return _open_month(BASE_URL + fname)
+      except Exception as exc:  # pragma: no cover - network/IO related
+        print(f"[ingest] failed to fetch {BASE_URL + fname}: {exc}")
+        return None
 
-    dfs: List[pd.DataFrame] = []
-    now_iso = datetime.datetime.utcnow().isoformat()
+    def _month_tables(pf: pq.ParquetFile, taxi: str, fname: str) -> Iterator[pa.Table]:
+      row_groups, columns, read_bytes, total_bytes = _plan(pf)
+      kept = 0
+      if row_groups:
+        for batch in pf.iter_batches(batch_size=BATCH_ROWS, row_groups=row_groups, columns=columns):
+          table = _normalize(batch, extracted_at, fname, taxi)
+          if "pickup_datetime" in table.column_names:
+            pickup = table["pickup_datetime"]
+            in_window = pc.and_(pc.greater_equal(pickup, pa.scalar(window_start, pa.timestamp("us"))),
+                                pc.less(pickup, pa.scalar(window_end, pa.timestamp("us"))))
+            table = table.filter(in_window)
+          kept += table.num_rows
+          if table.num_rows:
+            yield table
+      print(f"[ingest] {fname}: kept {kept:,} of {pf.metadata.num_rows:,} rows, "
+            f"read {len(row_groups)}/{pf.metadata.num_row_groups} row groups, "
+            f"skipped {(total_bytes - read_bytes) / 1024 / 1024:.1f} of {total_bytes / 1024 / 1024:.1f} MB")
+
+    def _batches() -> Iterator[pa.Table]:
+      # Sliding window: at most FETCH_WORKERS months are downloading or buffered,
+      # counting the one being yielded batch by batch, in month order.
+      with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        pending = deque()
+        todo = iter(fnames)
+        for taxi, fname in todo:
+          pending.append((taxi, fname, pool.submit(_fetch, fname)))
+          if len(pending) == FETCH_WORKERS:
+            break
+        while pending:
+          taxi, fname, future = pending.popleft()
+          pf = future.result()
+          if pf is not None:
+            yield from _month_tables(pf, taxi, fname)
+          # Release this month before starting the next download, so the
+          # window never holds more than FETCH_WORKERS files
+          del pf, future
+          for nxt_taxi, nxt in todo:
+            pending.append((nxt_taxi, nxt, pool.submit(_fetch, nxt)))
+            break
+
+    # Yielding Arrow tables lets the caller load the window incrementally; memory
+    # is bounded by the fetch window, not the number of months requested.
+    yield from _batches()
 
-    for taxi in taxi_types:
-      for year, month in _iter_months(start_date, end_date):
-        fname = f"{taxi}_tripdata_{year}-{month:02d}.parquet"
-        url = BASE_URL + fname
-        try:
-          resp = requests.get(url, timeout=30)
-          if resp.status_code != 200:
-            # skip missing months
-            print(f"[ingest] skipping {url}: status {resp.status_code}")
-            continue
-          # write to a temp file, then let pandas read_parquet (works with pyarrow engine)
-          with tempfile.NamedTemporaryFile(suffix=".parquet", delete=True) as tmp:
-            tmp.write(resp.content)
-            tmp.flush()
-            df = pd.read_parquet(tmp.name)
 
-          if not isinstance(df, pd.DataFrame):
-            # safety: try to coerce
-            df = pd.DataFrame(df)
+def write_duckdb(db_path: str | None = None) -> int:
+    """
+    Plain-Python mode: load the run window straight into DuckDB's ingestion.trips.
+
+    Each Arrow table from _trip_tables() is scanned by DuckDB in place (no pandas
+    conversion). The window's existing rows for the requested taxi types are
+    deleted first, and the delete and all inserts share one transaction, so
+    re-running a window replaces it instead of appending duplicates.
+    Returns the number of rows inserted.
+    """
+    import os
+    import json
 
-          # Add lineage/debugging columns
-          df["extracted_at"] = now_iso
-          df["_source_file"] = fname
-          dfs.append(df)
-        except Exception as exc:  # pragma: no cover - network/IO related
-          print(f"[ingest] failed to fetch {url}: {exc}")
-          continue
+    import duckdb
 
-    if not dfs:
-      # return an empty dataframe (Bruin will create an empty table if needed)
-      return pd.DataFrame()
+    if db_path is None:
+      # Bruin injects the connection as JSON via `secrets`; DUCKDB_PATH overrides it
+      conn = os.environ.get("DUCKDB_CONNECTION", "")
+      try:
+        db_path = json.loads(conn).get("path")
+      except ValueError:
+        db_path = conn or None
+      db_path = os.environ.get("DUCKDB_PATH") or db_path or "duckdb.db"
 
-    result = pd.concat(dfs, ignore_index=True, copy=False)
-    return result
+    window = _run_window()
+    con = duckdb.connect(db_path)
+    inserted = 0
+    try:
+      con.execute("CREATE SCHEMA IF NOT EXISTS ingestion")
+      con.execute("BEGIN TRANSACTION")
+      existing = {
+        name: kind for name, kind in con.execute(
+          "SELECT column_name, data_type FROM information_schema.columns "
+          "WHERE table_schema = 'ingestion' AND table_name = 'trips'"
+        ).fetchall()
+      }
+      if existing:
+        con.execute(
+          "DELETE FROM ingestion.trips "
+          "WHERE pickup_datetime >= ? AND pickup_datetime < ? AND list_contains(?, taxi_type)",
+          [window["window_start"].item(), window["window_end"].item(), list(window["taxi_types"])],
+        )
+      for batch in _trip_tables(window):
+        columns = [(name, kind) for name, kind, *_ in con.execute("DESCRIBE SELECT * FROM batch").fetchall()]
+        if not existing:
+          con.execute("CREATE TABLE ingestion.trips AS SELECT * FROM batch LIMIT 0")
+          existing = dict(columns)
+        for name, kind in columns:
+          if name not in existing:
+            # TLC adds columns over time (e.g. cbd_congestion_fee in 2025)
+            con.execute(f'ALTER TABLE ingestion.trips ADD COLUMN "{name}" {kind}')
+            existing[name] = kind
+        con.execute("INSERT INTO ingestion.trips BY NAME SELECT * FROM batch")
+        inserted += batch.num_rows
+      con.execute("COMMIT")
+    except BaseException:
+      con.execute("ROLLBACK")
+      raise
+    finally:
+      con.close()
+    print(f"[ingest] wrote {inserted:,} rows to {db_path} ingestion.trips")
+    return inserted
 
 
+if __name__ == "__main__":
+    write_duckdb()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Parity check and benchmark: 06_spark_sql.py with --engine spark vs duckdb.
+
+Runs the job once per engine on the same inputs, then checks that the two
+outputs have the same columns and types, the same report keys and values
+equal up to floating-point summation order. Wall time and peak resident
+memory (the job's whole process tree, JVM included, sampled from /proc) are
+reported per engine. Exits non-zero when the outputs differ.
+
+By default the input is the sample month in 01-docker-terraform, used as the
+green input and, with its lpep_ columns renamed, as the yellow one:
+
+    python compare_engines.py
+    python compare_engines.py --data data/10M --reports revenue daily vendor
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import duckdb
+import pyarrow.parquet as pq
+
+
+HERE   = os.path.dirname(os.path.abspath(__file__))
+JOB    = os.path.join(HERE, '..', 'code', '06_spark_sql.py')
+SAMPLE = os.path.join(HERE, '..', '..', '01-docker-terraform', 'green_tripdata_2025-11.parquet')
+
+REL_TOLERANCE = 1e-9
+
+
+def sample_inputs(work_dir):
+    green = os.path.join(work_dir, 'input', 'green', os.path.basename(SAMPLE))
+    yellow = os.path.join(work_dir, 'input', 'yellow', os.path.basename(SAMPLE).replace('green', 'yellow'))
+    os.makedirs(os.path.dirname(green))
+    os.makedirs(os.path.dirname(yellow))
+    shutil.copyfile(SAMPLE, green)
+    table = pq.read_table(SAMPLE)
+    pq.write_table(table.rename_columns([c.replace('lpep_', 'tpep_') for c in table.column_names]), yellow)
+    return os.path.dirname(green), os.path.dirname(yellow)
+
+
+def process_tree_rss(root_pid):
+    """Resident bytes of `root_pid` and all its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the command name may contain spaces; ppid follows its closing ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+def run_engine(engine, green, yellow, output, job_args):
+    command = [sys.executable, JOB, '--input_green', green, '--input_yellow', yellow,
+               '--output', output, '--engine', engine, *job_args]
+    start = time.time()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    peak = [0]
+    def sample():
+        while proc.poll() is None:
+            peak[0] = max(peak[0], process_tree_rss(proc.pid))
+            time.sleep(0.05)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    log = proc.stdout.read()
+    proc.wait()
+    sampler.join()
+    wall_seconds = time.time() - start
+
+    if proc.returncode != 0:
+        sys.stderr.write(log[-4000:])
+        raise SystemExit(f'{engine} run failed with exit code {proc.returncode}')
+    return wall_seconds, peak[0]
+
+
+def report_dirs(output, reports, zones):
+    # Mirrors the job: one report straight in <output> unless --reports or --zones
+    if not reports and not zones:
+        return {'revenue': output}
+    names = [os.path.splitext(os.path.basename(r))[0] for r in reports or ['revenue', 'borough']]
+    return {name: os.path.join(output, name) for name in names}
+
+
+def compare_outputs(spark_dir, duckdb_dir):
+    """List of differences between two report outputs (empty when they match)."""
+    con = duckdb.connect()
+    spark_rel = con.sql(f"SELECT * FROM read_parquet('{spark_dir}/**/*.parquet', hive_partitioning = true)")
+    duck_rel = con.sql(f"SELECT * FROM read_parquet('{duckdb_dir}/**/*.parquet', hive_partitioning = true)")
+
+    problems = []
+    spark_schema = dict(zip(spark_rel.columns, map(str, spark_rel.types)))
+    duck_schema = dict(zip(duck_rel.columns, map(str, duck_rel.types)))
+    if list(spark_schema) != list(duck_schema):
+        return [f'columns differ: {list(spark_schema)} vs {list(duck_schema)}']
+    for column in spark_schema:
+        if spark_schema[column] != duck_schema[column]:
+            problems.append(f'{column}: {spark_schema[column]} vs {duck_schema[column]}')
+
+    con.register('s', spark_rel)
+    con.register('d', duck_rel)
+    numeric = [c for c, t in spark_schema.items() if t in ('DOUBLE', 'FLOAT') or t.startswith('DECIMAL')]
+    keys = [c for c in spark_schema if c not in numeric]
+
+    counts = con.sql('SELECT (SELECT COUNT(*) FROM s), (SELECT COUNT(*) FROM d)').fetchone()
+    if counts[0] != counts[1]:
+        problems.append(f'row count: {counts[0]} vs {counts[1]}')
+
+    on = ' AND '.join(f's."{k}" IS NOT DISTINCT FROM d."{k}"' for k in keys)
+    missing = con.sql(f'SELECT COUNT(*) FROM s ANTI JOIN d ON {on}').fetchone()[0] if keys else 0
+    extra = con.sql(f'SELECT COUNT(*) FROM d ANTI JOIN s ON {on}').fetchone()[0] if keys else 0
+    if missing or extra:
+        problems.append(f'keys: {missing} only in spark, {extra} only in duckdb')
+
+    for column in numeric:
+        off = con.sql(f"""
+            SELECT COUNT(*) FROM s JOIN d ON {on}
+            WHERE NOT (s."{column}" IS NOT DISTINCT FROM d."{column}"
+                       OR abs(s."{column}" - d."{column}")
+                          <= {REL_TOLERANCE} * greatest(abs(s."{column}"), abs(d."{column}"), 1))""").fetchone()[0]
+        if off:
+            problems.append(f'{column}: {off} value(s) differ beyond {REL_TOLERANCE:g} relative')
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Spark vs DuckDB engine parity and benchmark')
+    parser.add_argument('--data', default=None,
+                        help='dataset with green/ and yellow/ (e.g. from generate_trips.py); '
+                             'default: the 01-docker-terraform sample month')
+    parser.add_argument('--reports', nargs='+', default=None, help='--reports passed to the job')
+    parser.add_argument('--output_mode', default='single', help='--output_mode passed to the job')
+    parser.add_argument('--zones', default=None, help='--zones passed to the job')
+    parser.add_argument('--keep', action='store_true', help='keep the outputs (path is printed)')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='engine-parity-')
+    if args.data:
+        green, yellow = os.path.join(args.data, 'green', '*', '*'), os.path.join(args.data, 'yellow', '*', '*')
+    else:
+        green, yellow = sample_inputs(work_dir)
+
+    job_args = ['--output_mode', args.output_mode]
+    if args.reports:
+        job_args += ['--reports', *args.reports]
+    if args.zones:
+        job_args += ['--zones', args.zones]
+
+    runs = {}
+    for engine in ('duckdb', 'spark'):
+        output = os.path.join(work_dir, engine)
+        wall_seconds, peak_rss = run_engine(engine, green, yellow, output, job_args)
+        runs[engine] = output
+        print(f'{engine:<7} {wall_seconds:>7.1f}s  peak RSS {peak_rss / 1024 / 1024:>7.0f} MB')
+
+    failed = False
+    for name, spark_dir in report_dirs(runs['spark'], args.reports, args.zones).items():
+        duckdb_dir = os.path.join(runs['duckdb'], os.path.relpath(spark_dir, runs['spark']))
+        problems = compare_outputs(spark_dir, duckdb_dir)
+        print(f'{name}: ' + ('outputs match' if not problems else 'MISMATCH'))
+        for problem in problems:
+            print(f'  {problem}')
+        failed = failed or bool(problems)
+
+    if args.keep:
+        print(f'outputs kept in {work_dir}')
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    raise SystemExit(1 if failed else 0)
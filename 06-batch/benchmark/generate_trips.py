@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Synthetic green / yellow trip data for the Spark benchmarks.
+
+Writes the layout the 06-batch jobs read, one Parquet file per month:
+
+    <output>/green/<year>/<MM>/green_tripdata_<year>-<MM>.parquet
+    <output>/yellow/<year>/<MM>/yellow_tripdata_<year>-<MM>.parquet
+
+with the column names and types of the 2025 TLC files. Rows are split evenly
+between the two services and the twelve months. Values follow rough TLC
+distributions, including a long-tailed pickup zone popularity so group-bys
+and joins see realistic skew. Generation is seeded, so a given row count
+always produces the same files, and happens in chunks so 100M rows need no
+more memory than 1M.
+
+    python generate_trips.py --rows 10M --output data/10M
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+CHUNK_ROWS = 1_000_000
+ZONES      = 265
+SEED       = 2025
+
+GREEN_SCHEMA = pa.schema([
+    ('VendorID', pa.int32()),
+    ('lpep_pickup_datetime', pa.timestamp('us')),
+    ('lpep_dropoff_datetime', pa.timestamp('us')),
+    ('store_and_fwd_flag', pa.large_string()),
+    ('RatecodeID', pa.int64()),
+    ('PULocationID', pa.int32()),
+    ('DOLocationID', pa.int32()),
+    ('passenger_count', pa.int64()),
+    ('trip_distance', pa.float64()),
+    ('fare_amount', pa.float64()),
+    ('extra', pa.float64()),
+    ('mta_tax', pa.float64()),
+    ('tip_amount', pa.float64()),
+    ('tolls_amount', pa.float64()),
+    ('ehail_fee', pa.float64()),
+    ('improvement_surcharge', pa.float64()),
+    ('total_amount', pa.float64()),
+    ('payment_type', pa.int64()),
+    ('trip_type', pa.int64()),
+    ('congestion_surcharge', pa.float64()),
+    ('cbd_congestion_fee', pa.float64()),
+])
+
+YELLOW_SCHEMA = pa.schema([
+    ('VendorID', pa.int32()),
+    ('tpep_pickup_datetime', pa.timestamp('us')),
+    ('tpep_dropoff_datetime', pa.timestamp('us')),
+    ('passenger_count', pa.int64()),
+    ('trip_distance', pa.float64()),
+    ('RatecodeID', pa.int64()),
+    ('store_and_fwd_flag', pa.large_string()),
+    ('PULocationID', pa.int32()),
+    ('DOLocationID', pa.int32()),
+    ('payment_type', pa.int64()),
+    ('fare_amount', pa.float64()),
+    ('extra', pa.float64()),
+    ('mta_tax', pa.float64()),
+    ('tip_amount', pa.float64()),
+    ('tolls_amount', pa.float64()),
+    ('improvement_surcharge', pa.float64()),
+    ('total_amount', pa.float64()),
+    ('congestion_surcharge', pa.float64()),
+    ('Airport_fee', pa.float64()),
+    ('cbd_congestion_fee', pa.float64()),
+])
+
+SCHEMAS = {'green': GREEN_SCHEMA, 'yellow': YELLOW_SCHEMA}
+PREFIXES = {'green': 'lpep', 'yellow': 'tpep'}
+
+
+def parse_rows(value):
+    """'1M' / '250k' / '100000000' -> int"""
+    value = value.strip().upper()
+    scale = {'K': 10 ** 3, 'M': 10 ** 6, 'B': 10 ** 9}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def zone_weights(rng):
+    # Zipf-like popularity over a fixed shuffle of the zones: a few Manhattan-
+    # style hot spots and a long tail
+    weights = 1.0 / np.arange(1, ZONES + 1) ** 1.1
+    return rng.permutation(weights / weights.sum())
+
+
+def month_bounds(year, month):
+    start = np.datetime64(f'{year}-{month:02d}-01', 'us')
+    end = np.datetime64(f'{year + month // 12}-{month % 12 + 1:02d}-01', 'us')
+    return start, end
+
+
+def make_chunk(rng, service, rows, year, month, weights):
+    prefix = PREFIXES[service]
+    start, end = month_bounds(year, month)
+
+    span = (end - start).astype(np.int64)
+    pickup = start + rng.integers(0, span, rows).astype('timedelta64[us]')
+    duration = np.clip(rng.lognormal(6.6, 0.6, rows), 30, 4 * 3600)  # seconds, median ~12 min
+    dropoff = pickup + (duration * 1_000_000).astype('timedelta64[us]')
+
+    distance = np.round(np.clip(rng.lognormal(0.6, 0.8, rows), 0, 200), 2)
+    fare = np.round(3.0 + 2.5 * distance + 0.5 * duration / 60, 2)
+    payment = rng.choice([1, 2, 3, 4], rows, p=[0.72, 0.25, 0.02, 0.01])
+    tip = np.where(payment == 1, np.round(fare * rng.uniform(0.1, 0.3, rows), 2), 0.0)
+    tolls = np.where(rng.random(rows) < 0.05, 6.94, 0.0)
+    extra = rng.choice([0.0, 1.0, 2.5], rows, p=[0.5, 0.3, 0.2])
+    mta_tax = np.full(rows, 0.5)
+    improvement = np.full(rows, 1.0)
+    congestion = np.where(rng.random(rows) < 0.7, 2.5, 0.0)
+    cbd = np.where(rng.random(rows) < 0.4, 0.75, 0.0)
+    total = np.round(fare + extra + mta_tax + tip + tolls + improvement + congestion + cbd, 2)
+
+    # TLC leaves passenger_count / RatecodeID / flag null on a few percent of rows
+    missing = rng.random(rows) < 0.03
+    passengers = pa.array(rng.choice([1, 1, 1, 1, 2, 2, 3, 4, 5, 6], rows), pa.int64(), mask=missing)
+    ratecode = pa.array(rng.choice([1, 2, 3, 4, 5, 99], rows, p=[0.93, 0.03, 0.01, 0.01, 0.01, 0.01]),
+                        pa.int64(), mask=missing)
+    flag = pa.array(np.where(rng.random(rows) < 0.01, 'Y', 'N'), pa.large_string(), mask=missing)
+
+    columns = {
+        'VendorID': pa.array(rng.choice([1, 2, 6], rows, p=[0.25, 0.74, 0.01]), pa.int32()),
+        f'{prefix}_pickup_datetime': pa.array(pickup, pa.timestamp('us')),
+        f'{prefix}_dropoff_datetime': pa.array(dropoff, pa.timestamp('us')),
+        'store_and_fwd_flag': flag,
+        'RatecodeID': ratecode,
+        'PULocationID': pa.array(rng.choice(ZONES, rows, p=weights) + 1, pa.int32()),
+        'DOLocationID': pa.array(rng.choice(ZONES, rows, p=weights) + 1, pa.int32()),
+        'passenger_count': passengers,
+        'trip_distance': pa.array(distance),
+        'fare_amount': pa.array(fare),
+        'extra': pa.array(extra),
+        'mta_tax': pa.array(mta_tax),
+        'tip_amount': pa.array(tip),
+        'tolls_amount': pa.array(tolls),
+        'ehail_fee': pa.nulls(rows, pa.float64()),
+        'improvement_surcharge': pa.array(improvement),
+        'total_amount': pa.array(total),
+        'payment_type': pa.array(payment, pa.int64()),
+        'trip_type': pa.array(rng.choice([1, 2], rows, p=[0.97, 0.03]), pa.int64()),
+        'congestion_surcharge': pa.array(congestion),
+        'Airport_fee': pa.array(np.where(rng.random(rows) < 0.08, 1.75, 0.0)),
+        'cbd_congestion_fee': pa.array(cbd),
+    }
+    schema = SCHEMAS[service]
+    return pa.table([columns[name] for name in schema.names], schema=schema)
+
+
+def month_path(output, service, year, month):
+    return os.path.join(output, service, str(year), f'{month:02d}',
+                        f'{service}_tripdata_{year}-{month:02d}.parquet')
+
+
+def generate(output, rows, year=2025):
+    """Write `rows` trips (half green, half yellow) under `output`; returns the file paths."""
+    weights = zone_weights(np.random.default_rng(SEED))
+    paths = []
+    for s, service in enumerate(SCHEMAS):
+        service_rows = rows // 2 + (rows % 2 if s == 0 else 0)
+        for month in range(1, 13):
+            month_rows = service_rows // 12 + (1 if month <= service_rows % 12 else 0)
+            path = month_path(output, service, year, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with pq.ParquetWriter(tmp, SCHEMAS[service], compression='snappy') as writer:
+                for c, offset in enumerate(range(0, month_rows, CHUNK_ROWS)):
+                    rng = np.random.default_rng([SEED, s, month, c])
+                    chunk = make_chunk(rng, service, min(CHUNK_ROWS, month_rows - offset), year, month, weights)
+                    writer.write_table(chunk)
+            os.replace(tmp, path)
+            paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic green/yellow trip Parquet files')
+    parser.add_argument('--rows', required=True, help='total rows, e.g. 1M, 10M, 100M')
+    parser.add_argument('--output', required=True, help='directory to write green/ and yellow/ into')
+    parser.add_argument('--year', type=int, default=2025)
+    args = parser.parse_args()
+
+    paths = generate(args.output, parse_rows(args.rows), args.year)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f'{len(paths)} files, {size / 1024 / 1024:.1f} MB under {args.output}')
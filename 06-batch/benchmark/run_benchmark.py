@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmark the 06_spark_sql.py revenue job on synthetic data.
+
+Each run starts the job in its own local[*] Spark application (a fresh JVM,
+so runs do not share caches or JIT warm-up) with the event log switched on,
+then reads the log back for shuffle, spill and executor memory figures. One
+record per run is appended to a JSON results file together with the git
+commit, so the same file can collect runs from several commits:
+
+    python run_benchmark.py --rows 1M,10M --results results.json
+    git checkout other-branch
+    python run_benchmark.py --rows 1M,10M --results results.json
+    python run_benchmark.py --compare results.json
+
+Data is generated on first use (generate_trips.py) and kept under
+--data_dir/<rows>, so later runs at the same scale skip that step.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+from generate_trips import generate, parse_rows
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JOB  = os.path.join(HERE, '..', 'code', '06_spark_sql.py')
+
+# Written to a plain, single, uncompressed event log file so it can be parsed
+# line by line; process-tree metrics give the executor's resident memory
+EVENT_LOG_CONF = {
+    'spark.eventLog.enabled': 'true',
+    'spark.eventLog.rolling.enabled': 'false',
+    'spark.eventLog.compress': 'false',
+    'spark.eventLog.logStageExecutorMetrics': 'true',
+    'spark.executor.metrics.pollingInterval': '100ms',
+    'spark.executor.processTreeMetrics.enabled': 'true',
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def format_rows(rows):
+    for suffix, scale in (('B', 10 ** 9), ('M', 10 ** 6), ('K', 10 ** 3)):
+        if rows >= scale and rows % scale == 0:
+            return f'{rows // scale}{suffix}'
+    return str(rows)
+
+
+def ensure_data(data_dir, rows):
+    path = os.path.join(data_dir, format_rows(rows))
+    marker = os.path.join(path, '_SUCCESS')
+    if not os.path.exists(marker):
+        print(f'generating {format_rows(rows)} rows under {path}')
+        start = time.time()
+        generate(path, rows)
+        open(marker, 'w').close()
+        print(f'  done in {time.time() - start:.1f}s')
+    return path
+
+
+def parse_event_log(path):
+    """Totals over every task plus the peak executor memory seen in any stage."""
+    metrics = {
+        'spark_version': None,
+        'stages': 0,
+        'tasks': 0,
+        'input_records': 0,
+        'shuffle_read_bytes': 0,
+        'shuffle_write_bytes': 0,
+        'memory_spilled_bytes': 0,
+        'disk_spilled_bytes': 0,
+        'peak_task_execution_memory_bytes': 0,
+        'peak_jvm_heap_bytes': 0,
+        'peak_execution_memory_bytes': 0,
+        'peak_jvm_rss_bytes': 0,
+    }
+    with open(path) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                break  # an .inprogress log can end in a partly written line
+            kind = event['Event']
+            if kind == 'SparkListenerLogStart':
+                metrics['spark_version'] = event['Spark Version']
+            elif kind == 'SparkListenerStageCompleted':
+                metrics['stages'] += 1
+            elif kind == 'SparkListenerTaskEnd' and 'Task Metrics' in event:
+                task = event['Task Metrics']
+                shuffle_read = task['Shuffle Read Metrics']
+                metrics['tasks'] += 1
+                metrics['input_records'] += task['Input Metrics']['Records Read']
+                metrics['shuffle_read_bytes'] += shuffle_read['Remote Bytes Read'] + shuffle_read['Local Bytes Read']
+                metrics['shuffle_write_bytes'] += task['Shuffle Write Metrics']['Shuffle Bytes Written']
+                metrics['memory_spilled_bytes'] += task['Memory Bytes Spilled']
+                metrics['disk_spilled_bytes'] += task['Disk Bytes Spilled']
+                metrics['peak_task_execution_memory_bytes'] = max(
+                    metrics['peak_task_execution_memory_bytes'], task['Peak Execution Memory'])
+            elif kind == 'SparkListenerStageExecutorMetrics':
+                peaks = event['Executor Metrics']
+                metrics['peak_jvm_heap_bytes'] = max(metrics['peak_jvm_heap_bytes'], peaks['JVMHeapMemory'])
+                metrics['peak_execution_memory_bytes'] = max(
+                    metrics['peak_execution_memory_bytes'],
+                    peaks['OnHeapExecutionMemory'] + peaks['OffHeapExecutionMemory'])
+                metrics['peak_jvm_rss_bytes'] = max(metrics['peak_jvm_rss_bytes'], peaks['ProcessTreeJVMRSSMemory'])
+    return metrics
+
+
+def run_job(data_path, profile, output_mode, driver_memory, extra_args):
+    work_dir = tempfile.mkdtemp(prefix='spark-bench-')
+    event_dir = os.path.join(work_dir, 'events')
+    os.makedirs(event_dir)
+
+    conf = {**EVENT_LOG_CONF, 'spark.eventLog.dir': 'file://' + event_dir}
+    submit_args = ['--master', 'local[*]', '--driver-memory', driver_memory]
+    for key, value in conf.items():
+        submit_args += ['--conf', f'{key}={value}']
+    env = {**os.environ, 'PYSPARK_SUBMIT_ARGS': ' '.join(submit_args + ['pyspark-shell'])}
+
+    command = [
+        sys.executable, JOB,
+        '--input_green', os.path.join(data_path, 'green', '*', '*'),
+        '--input_yellow', os.path.join(data_path, 'yellow', '*', '*'),
+        '--output', os.path.join(work_dir, 'output'),
+        '--output_mode', output_mode,
+        '--profile', profile,
+        *extra_args,
+    ]
+
+    start = time.time()
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    wall_seconds = time.time() - start
+
+    try:
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr[-4000:])
+            raise RuntimeError(f'job failed with exit code {result.returncode}')
+        # The job does not stop its session, so the log may keep .inprogress
+        logs = glob.glob(os.path.join(event_dir, '*'))
+        if len(logs) != 1:
+            raise RuntimeError(f'expected one event log in {event_dir}, found {len(logs)}')
+        metrics = parse_event_log(logs[0])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'wall_seconds': round(wall_seconds, 2), **metrics}
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, path)
+
+
+def compare(results):
+    """One line per commit and scenario: medians, and wall time relative to the first commit."""
+    groups = {}
+    for record in results:
+        scenario = (record['rows'], record['profile'], record['output_mode'])
+        groups.setdefault(scenario, {}).setdefault(record['commit'], []).append(record)
+
+    mb = 1024 * 1024
+    for (rows, profile, output_mode), commits in sorted(groups.items()):
+        print(f'\n{format_rows(rows)} rows, profile={profile}, output_mode={output_mode}')
+        print(f'  {"commit":<16} {"runs":>4} {"wall s":>8} {"vs first":>8} {"shuffle MB":>10} '
+              f'{"spill MB":>9} {"heap MB":>8} {"rss MB":>7}')
+        baseline = None
+        for commit, records in commits.items():
+            wall = statistics.median(r['wall_seconds'] for r in records)
+            baseline = baseline or wall
+            shuffle = statistics.median(r['shuffle_write_bytes'] for r in records) / mb
+            spill = statistics.median(r['memory_spilled_bytes'] + r['disk_spilled_bytes'] for r in records) / mb
+            heap = max(r['peak_jvm_heap_bytes'] for r in records) / mb
+            rss = max(r['peak_jvm_rss_bytes'] for r in records) / mb
+            print(f'  {commit:<16} {len(records):>4} {wall:>8.1f} {(wall / baseline - 1) * 100:>+7.1f}% '
+                  f'{shuffle:>10.1f} {spill:>9.1f} {heap:>8.0f} {rss:>7.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark 06_spark_sql.py on synthetic taxi data')
+    parser.add_argument('--rows', default='1M',
+                        help='comma-separated total row counts, e.g. 1M,10M,100M (default: 1M)')
+    parser.add_argument('--results', default=os.path.join(HERE, 'results.json'),
+                        help='JSON file the run records are appended to')
+    parser.add_argument('--data_dir', default=os.path.join(HERE, 'data'),
+                        help='where the synthetic datasets are generated and kept')
+    parser.add_argument('--profile', default='local', help='--profile passed to the job')
+    parser.add_argument('--output_mode', default='single', help='--output_mode passed to the job')
+    parser.add_argument('--driver_memory', default='4g', help='local[*] runs everything in the driver JVM')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scale')
+    parser.add_argument('--label', default=None, help='free-form note stored with each record')
+    parser.add_argument('--compare', metavar='RESULTS', default=None,
+                        help='print a per-commit comparison of a results file and exit')
+    parser.add_argument('job_args', nargs=argparse.REMAINDER,
+                        help='anything after -- is passed to 06_spark_sql.py unchanged')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(load_results(args.compare))
+        raise SystemExit(0)
+
+    extra_args = args.job_args[1:] if args.job_args[:1] == ['--'] else args.job_args
+    commit = git_commit()
+    results = load_results(args.results)
+
+    for rows in [parse_rows(r) for r in args.rows.split(',')]:
+        data_path = ensure_data(args.data_dir, rows)
+        for attempt in range(args.repeat):
+            print(f'{format_rows(rows)} rows, run {attempt + 1}/{args.repeat} ...', flush=True)
+            record = {
+                'commit': commit,
+                'label': args.label,
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'host': platform.node(),
+                'cpus': os.cpu_count(),
+                'rows': rows,
+                'profile': args.profile,
+                'output_mode': args.output_mode,
+                'driver_memory': args.driver_memory,
+                'job_args': extra_args,
+                **run_job(data_path, args.profile, args.output_mode, args.driver_memory, extra_args),
+            }
+            results.append(record)
+            save_results(args.results, results)
+            print(f'  {record["wall_seconds"]:.1f}s, shuffle {record["shuffle_write_bytes"] / 1024 / 1024:.1f} MB, '
+                  f'spill {(record["memory_spilled_bytes"] + record["disk_spilled_bytes"]) / 1024 / 1024:.1f} MB, '
+                  f'peak heap {record["peak_jvm_heap_bytes"] / 1024 / 1024:.0f} MB')
+
+    print(f'{len(results)} record(s) in {args.results}')
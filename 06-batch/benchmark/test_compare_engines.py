@@ -0,0 +1,73 @@
+"""
+06_spark_sql.py --engine duckdb vs spark on a small generated dataset.
+
+    pytest 06-batch/benchmark/test_compare_engines.py
+
+The DuckDB run is checked against the inputs on its own, so the file still
+tests something where pyspark is not installed; the parity test then runs
+the Spark engine and compares every report with compare_outputs().
+"""
+
+import os
+
+import duckdb
+import pytest
+
+from compare_engines import compare_outputs, report_dirs, run_engine
+from generate_trips import generate
+
+
+ROWS    = 24_000
+REPORTS = ['revenue', 'daily', 'vendor']
+
+
+def run(engine, inputs, output):
+    try:
+        run_engine(engine, *inputs, output, ['--reports', *REPORTS])
+    except SystemExit as exc:  # run_engine's failure exit; the job log is on stderr
+        pytest.fail(str(exc))
+
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('trips'))
+    generate(root, ROWS)
+    return os.path.join(root, 'green', '*', '*'), os.path.join(root, 'yellow', '*', '*')
+
+
+@pytest.fixture(scope='module')
+def duckdb_output(inputs, tmp_path_factory):
+    output = str(tmp_path_factory.mktemp('duckdb') / 'out')
+    run('duckdb', inputs, output)
+    return output
+
+
+def test_duckdb_revenue_matches_inputs(inputs, duckdb_output):
+    green, yellow = inputs
+    con = duckdb.connect()
+    expected = con.sql(f"""
+        SELECT service_type, count(*) AS trips, round(sum(fare_amount), 6) AS fare FROM (
+            SELECT 'green' AS service_type, fare_amount FROM read_parquet('{green}/*.parquet')
+            UNION ALL
+            SELECT 'yellow', fare_amount FROM read_parquet('{yellow}/*.parquet'))
+        GROUP BY 1 ORDER BY 1""").fetchall()
+    revenue = os.path.join(duckdb_output, 'revenue')
+    got = con.sql(f"""
+        SELECT service_type, round(sum(revenue_monthly_fare), 6)
+        FROM read_parquet('{revenue}/**/*.parquet', hive_partitioning = true)
+        GROUP BY 1 ORDER BY 1""").fetchall()
+
+    assert [trips for _, trips, _ in expected] == [ROWS // 2, ROWS // 2]
+    assert got == [(service, fare) for service, _, fare in expected]
+
+
+def test_engines_produce_the_same_reports(inputs, duckdb_output, tmp_path):
+    pytest.importorskip('pyspark')
+    spark_output = str(tmp_path / 'spark')
+    run('spark', inputs, spark_output)
+
+    dirs = report_dirs(spark_output, REPORTS, None)
+    assert sorted(dirs) == sorted(REPORTS)
+    for name, spark_dir in dirs.items():
+        duckdb_dir = os.path.join(duckdb_output, os.path.relpath(spark_dir, spark_output))
+        assert compare_outputs(spark_dir, duckdb_dir) == [], name
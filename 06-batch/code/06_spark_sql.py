@@ -2,81 +2,220 @@
 # coding: utf-8
 
 import argparse
-
-import pyspark
-from pyspark.sql import SparkSession
-from pyspark.sql import functions as F
-
-
-parser = argparse.ArgumentParser()
-
-parser.add_argument('--input_green', required=True)
-parser.add_argument('--input_yellow', required=True)
-parser.add_argument('--output', required=True)
-
-args = parser.parse_args()
-
-input_green = args.input_green
-input_yellow = args.input_yellow
-output = args.output
-
-
-spark = SparkSession.builder \
-    .appName('test') \
-    .getOrCreate()
-
-df_green = spark.read.parquet(input_green)
-
-df_green = df_green \
-    .withColumnRenamed('lpep_pickup_datetime', 'pickup_datetime') \
-    .withColumnRenamed('lpep_dropoff_datetime', 'dropoff_datetime')
-
-df_yellow = spark.read.parquet(input_yellow)
-
-
-df_yellow = df_yellow \
-    .withColumnRenamed('tpep_pickup_datetime', 'pickup_datetime') \
-    .withColumnRenamed('tpep_dropoff_datetime', 'dropoff_datetime')
-
-
-common_colums = [
-    'VendorID',
-    'pickup_datetime',
-    'dropoff_datetime',
-    'store_and_fwd_flag',
-    'RatecodeID',
-    'PULocationID',
-    'DOLocationID',
-    'passenger_count',
-    'trip_distance',
-    'fare_amount',
-    'extra',
-    'mta_tax',
-    'tip_amount',
-    'tolls_amount',
-    'improvement_surcharge',
-    'total_amount',
-    'payment_type',
-    'congestion_surcharge'
-]
-
-
-
-df_green_sel = df_green \
-    .select(common_colums) \
-    .withColumn('service_type', F.lit('green'))
-
-df_yellow_sel = df_yellow \
-    .select(common_colums) \
-    .withColumn('service_type', F.lit('yellow'))
-
-
-df_trips_data = df_green_sel.unionAll(df_yellow_sel)
-
-df_trips_data.registerTempTable('trips_data')
-
-
-df_result = spark.sql("""
+import json
+import os
+import time
+
+# Optional: --engine duckdb runs without pyspark installed
+try:
+    from pyspark import StorageLevel
+    from pyspark.sql import functions as F
+except ImportError:
+    StorageLevel = F = None
+
+from spark_session import add_profile_argument, create_session, print_job_summary
+from trips_data import (
+    COMMON_COLUMNS, REVENUE_COLUMNS, build_trips, check_no_trips_shuffle, read_trips, read_zones,
+    with_pickup_zones)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--input_green', required=True)
+    parser.add_argument('--input_yellow', required=True)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--output_mode', choices=['single', 'partitioned'], default='single',
+                        help="'single': coalesce(1) into one file; "
+                             "'partitioned': service_type=/revenue_month= directories written in parallel")
+    parser.add_argument('--target_file_mb', type=int, default=128,
+                        help='partitioned mode: approximate size of each output file')
+    parser.add_argument('--bucket_zones', type=int, default=0,
+                        help='partitioned mode: also bucket by revenue_zone into N buckets '
+                             '(writes a metastore table named after the output directory)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only recompute months whose input files changed since the last run '
+                             '(implies --output_mode partitioned)')
+    parser.add_argument('--state_file', default=None,
+                        help='incremental mode: where the input file state is kept '
+                             '(default: <output>/_incremental_state.json)')
+    parser.add_argument('--start_date', default=None,
+                        help='only trips picked up on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--end_date', default=None,
+                        help='only trips picked up before this date (YYYY-MM-DD)')
+    parser.add_argument('--explain', action='store_true',
+                        help='print the physical plan (ReadSchema, PushedFilters) and exit without writing')
+    parser.add_argument('--reports', nargs='+', default=None,
+                        help=f'reports to compute from one scan of the inputs: built-in names '
+                             f'({", ".join({**REPORTS, **ZONE_REPORTS})}; borough needs --zones) or paths '
+                             f'to .sql files querying trips_data; each is written to <output>/<name> '
+                             f'(default: revenue, written to <output>; with --zones: revenue and borough)')
+    parser.add_argument('--zones', default=None,
+                        help='taxi_zone_lookup.csv; broadcast-joined to the trips so reports get '
+                             'pickup_borough / pickup_zone / pickup_service_zone and the borough report')
+    parser.add_argument('--storage_level', default='MEMORY_AND_DISK',
+                        choices=['NONE', 'MEMORY_ONLY', 'MEMORY_AND_DISK', 'MEMORY_AND_DISK_DESER',
+                                 'DISK_ONLY'],
+                        help='how trips_data is persisted between reports when there is more than one')
+    parser.add_argument('--engine', choices=['spark', 'duckdb'], default='spark',
+                        help="'duckdb': same reports and output layout computed in-process, without "
+                             "starting Spark (local paths; no --incremental or --bucket_zones)")
+    add_profile_argument(parser)
+
+    args = parser.parse_args(argv)
+
+    if args.engine == 'duckdb' and (args.incremental or args.bucket_zones):
+        parser.error('--engine duckdb supports neither --incremental nor --bucket_zones')
+    if args.engine == 'spark' and F is None:
+        parser.error('--engine spark needs pyspark installed; use --engine duckdb without it')
+
+    if args.incremental:
+        if args.bucket_zones:
+            parser.error('--incremental cannot be combined with --bucket_zones')
+        if args.start_date or args.end_date:
+            parser.error('--incremental picks its own months; drop --start_date/--end_date')
+        args.output_mode = 'partitioned'
+
+    args.state_file = args.state_file or args.output.rstrip('/') + '/_incremental_state.json'
+    return args
+
+
+def hadoop_fs(spark, path):
+    # Works for any Hadoop filesystem (local, gs://, hdfs://)
+    hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+    return hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration()), hadoop_path
+
+
+def list_input_files(spark, pattern):
+    # {qualified path: [mtime, size]} for every data file matched by a glob
+    fs, hadoop_path = hadoop_fs(spark, pattern)
+    found = {}
+    for match in fs.globStatus(hadoop_path) or []:
+        files = fs.listFiles(match.getPath(), True)
+        while files.hasNext():
+            status = files.next()
+            name = status.getPath().getName()
+            if not name.startswith(('_', '.')):
+                found[status.getPath().toString()] = [status.getModificationTime(), status.getLen()]
+    return found
+
+
+def read_state(spark, path):
+    fs, hadoop_path = hadoop_fs(spark, path)
+    if not fs.exists(hadoop_path):
+        return {'green': {}, 'yellow': {}}
+    stream = fs.open(hadoop_path)
+    try:
+        reader = spark._jvm.java.io.BufferedReader(spark._jvm.java.io.InputStreamReader(stream, 'UTF-8'))
+        return json.loads(''.join(iter(reader.readLine, None)))
+    finally:
+        stream.close()
+
+
+def write_state(spark, path, state):
+    fs, hadoop_path = hadoop_fs(spark, path)
+    stream = fs.create(hadoop_path, True)
+    try:
+        stream.write(bytearray(json.dumps(state).encode('utf-8')))
+    finally:
+        stream.close()
+
+
+def drop_partitions(spark, output, partitions):
+    # Dynamic overwrite only replaces partitions that still get rows; months
+    # whose trips all disappeared have to be removed explicitly
+    fs, _ = hadoop_fs(spark, output)
+    for service, month in sorted(partitions):
+        stale = spark._jvm.org.apache.hadoop.fs.Path(
+            f'{output.rstrip("/")}/service_type={service}/revenue_month={month}')
+        if fs.exists(stale):
+            fs.delete(stale, True)
+            print(f'incremental: removed empty partition {service}/{month}')
+
+
+def normalize_path(spark, path):
+    # input_file_name() gives file:///x where the listing gives file:/x
+    return spark._jvm.org.apache.hadoop.fs.Path(path).toString()
+
+
+def file_months(spark, df):
+    # {file: [month, ...]} from the pickup column alone, so the scan stays cheap
+    rows = df \
+        .select(F.input_file_name().alias('file'),
+                F.date_format(F.date_trunc('month', 'pickup_datetime'), 'yyyy-MM-dd').alias('month')) \
+        .distinct() \
+        .collect()
+    months = {}
+    for row in rows:
+        if row.month is not None:
+            months.setdefault(normalize_path(spark, row.file), set()).add(row.month)
+    return {f: sorted(m) for f, m in months.items()}
+
+
+def next_month(month):
+    # 'YYYY-MM-01' -> first day of the following month
+    year, mon = int(month[:4]), int(month[5:7])
+    return f'{year + mon // 12:04d}-{mon % 12 + 1:02d}-01'
+
+
+def incremental_trips(spark, args, inputs, columns):
+    """
+    Trips for the months touched by input files that changed since the last run.
+
+    A file counts as changed when it is new or its mtime/size differ from the
+    state; the months it covered before and covers now are recomputed, plus
+    the months of files that disappeared. Only files touching those months
+    are read again. Returns (trips or None, affected partitions, new state).
+    """
+    state = read_state(spark, args.state_file)
+    new_state = {}
+    affected = {}
+    service_inputs = {}
+
+    for service, pattern in inputs.items():
+        previous = state.get(service, {})
+        current = list_input_files(spark, pattern)
+        changed = [f for f, (mtime, size) in current.items()
+                   if previous.get(f, {}).get('stat') != [mtime, size]]
+        removed = [f for f in previous if f not in current]
+
+        months = set()
+        for f in changed + removed:
+            months.update(previous.get(f, {}).get('months', []))
+        scanned = file_months(spark, read_trips(spark, changed, service, ['pickup_datetime'])) if changed else {}
+        for f in changed:
+            months.update(scanned.get(f, []))
+
+        new_state[service] = {
+            f: {'stat': stat, 'months': scanned.get(f, []) if f in changed else previous[f]['months']}
+            for f, stat in current.items()
+        }
+        affected[service] = sorted(months)
+        print(f'{service}: {len(changed)} changed, {len(removed)} removed of {len(current)} file(s); '
+              f'recomputing {len(months)} month(s)')
+
+        to_read = [f for f, entry in new_state[service].items() if months.intersection(entry['months'])]
+        if to_read:
+            service_inputs[service] = (to_read, sorted(months))
+
+    affected_partitions = {(service, month) for service, months in affected.items() for month in months}
+    if not service_inputs:
+        return None, affected_partitions, new_state
+
+    # The span of the changed months goes into the scan; the exact month list
+    # is applied on top, since the months need not be contiguous
+    frames = [
+        read_trips(spark, paths, service, columns, months[0], next_month(months[-1]))
+        .filter(F.date_format(F.date_trunc('month', 'pickup_datetime'), 'yyyy-MM-dd').isin(months))
+        for service, (paths, months) in service_inputs.items()
+    ]
+    df_trips_data = frames[0]
+    for df_service in frames[1:]:
+        df_trips_data = df_trips_data.unionByName(df_service)
+    return df_trips_data, affected_partitions, new_state
+
+
+REVENUE_SQL = """
 SELECT 
     -- Reveneue grouping 
     PULocationID AS revenue_zone,
@@ -100,12 +239,301 @@ FROM
     trips_data
 GROUP BY
     1, 2, 3
-""")
+"""
+
+DAILY_SQL = """
+SELECT
+    service_type,
+    date_trunc('month', pickup_datetime) AS revenue_month,
+    CAST(pickup_datetime AS DATE) AS revenue_day,
+
+    COUNT(1) AS number_of_trips,
+    SUM(fare_amount) AS revenue_daily_fare,
+    SUM(tip_amount) AS revenue_daily_tip_amount,
+    SUM(total_amount) AS revenue_daily_total_amount,
+    AVG(passenger_count) AS avg_daily_passenger_count,
+    AVG(trip_distance) AS avg_daily_trip_distance
+FROM
+    trips_data
+GROUP BY
+    1, 2, 3
+"""
 
+VENDOR_SQL = """
+SELECT
+    service_type,
+    date_trunc('month', pickup_datetime) AS revenue_month,
+    VendorID AS vendor_id,
+
+    COUNT(1) AS number_of_trips,
+    SUM(total_amount) AS revenue_monthly_total_amount,
+    SUM(tip_amount) AS revenue_monthly_tip_amount,
+    AVG(trip_distance) AS avg_monthly_trip_distance,
+    AVG(CAST(payment_type = 1 AS DOUBLE)) AS card_payment_share
+FROM
+    trips_data
+GROUP BY
+    1, 2, 3
+"""
 
-df_result.coalesce(1) \
-    .write.parquet(output, mode='overwrite')
+REVENUE_ZONES_SQL = """
+SELECT
+    -- Revenue grouping
+    PULocationID AS revenue_zone,
+    pickup_borough AS revenue_borough,
+    pickup_zone AS revenue_zone_name,
+    date_trunc('month', pickup_datetime) AS revenue_month,
+    service_type,
 
+    -- Revenue calculation
+    SUM(fare_amount) AS revenue_monthly_fare,
+    SUM(extra) AS revenue_monthly_extra,
+    SUM(mta_tax) AS revenue_monthly_mta_tax,
+    SUM(tip_amount) AS revenue_monthly_tip_amount,
+    SUM(tolls_amount) AS revenue_monthly_tolls_amount,
+    SUM(improvement_surcharge) AS revenue_monthly_improvement_surcharge,
+    SUM(total_amount) AS revenue_monthly_total_amount,
+    SUM(congestion_surcharge) AS revenue_monthly_congestion_surcharge,
 
+    -- Additional calculations
+    AVG(passenger_count) AS avg_montly_passenger_count,
+    AVG(trip_distance) AS avg_montly_trip_distance
+FROM
+    trips_data
+GROUP BY
+    1, 2, 3, 4, 5
+"""
 
+BOROUGH_SQL = """
+SELECT
+    COALESCE(pickup_borough, 'Unknown') AS revenue_borough,
+    date_trunc('month', pickup_datetime) AS revenue_month,
+    service_type,
 
+    COUNT(1) AS number_of_trips,
+    COUNT(DISTINCT PULocationID) AS number_of_zones,
+    SUM(fare_amount) AS revenue_monthly_fare,
+    SUM(extra) AS revenue_monthly_extra,
+    SUM(mta_tax) AS revenue_monthly_mta_tax,
+    SUM(tip_amount) AS revenue_monthly_tip_amount,
+    SUM(tolls_amount) AS revenue_monthly_tolls_amount,
+    SUM(improvement_surcharge) AS revenue_monthly_improvement_surcharge,
+    SUM(total_amount) AS revenue_monthly_total_amount,
+    SUM(congestion_surcharge) AS revenue_monthly_congestion_surcharge,
+    AVG(passenger_count) AS avg_monthly_passenger_count,
+    AVG(trip_distance) AS avg_monthly_trip_distance
+FROM
+    trips_data
+GROUP BY
+    1, 2, 3
+"""
+
+# Built-in reports: name -> (SQL over trips_data, columns it reads). Every
+# report returns service_type and revenue_month so it can be written in
+# partitioned and incremental mode.
+REPORTS = {
+    'revenue': (REVENUE_SQL, REVENUE_COLUMNS),
+    'daily': (DAILY_SQL, ['pickup_datetime', 'passenger_count', 'trip_distance',
+                          'fare_amount', 'tip_amount', 'total_amount']),
+    'vendor': (VENDOR_SQL, ['VendorID', 'pickup_datetime', 'trip_distance',
+                            'tip_amount', 'total_amount', 'payment_type']),
+}
+
+# Replacements and additions when the trips carry pickup zones (--zones)
+ZONE_REPORTS = {
+    'revenue': (REVENUE_ZONES_SQL, REVENUE_COLUMNS),
+    'borough': (BOROUGH_SQL, REVENUE_COLUMNS),
+}
+
+
+def load_reports(names, zones=False):
+    """[(name, sql, columns)]; SQL files are named after the file and may read any common column."""
+    builtins = {**REPORTS, **ZONE_REPORTS} if zones else REPORTS
+    reports = []
+    for name in names:
+        if name in builtins:
+            sql, columns = builtins[name]
+            reports.append((name, sql, columns))
+        elif name in ZONE_REPORTS:
+            raise SystemExit(f'report {name!r} needs --zones')
+        elif name.endswith('.sql'):
+            with open(name) as f:
+                reports.append((os.path.splitext(os.path.basename(name))[0], f.read(), COMMON_COLUMNS))
+        else:
+            raise SystemExit(f'unknown report {name!r}: expected one of {", ".join(builtins)} or a .sql file')
+    return reports
+
+
+def estimated_row_bytes(schema):
+    # Uncompressed width of a result row; Parquet files come out smaller, so
+    # files stay at or below the target size.
+    sizes = {'double': 8, 'bigint': 8, 'timestamp': 8, 'date': 4, 'int': 4, 'smallint': 2, 'string': 16}
+    return sum(sizes.get(field.dataType.simpleString(), 8) for field in schema.fields)
+
+
+def count_output_files(spark, path):
+    fs, hadoop_path = hadoop_fs(spark, path)
+    files = fs.listFiles(hadoop_path, True)
+    count, size = 0, 0
+    while files.hasNext():
+        status = files.next()
+        if status.getPath().getName().startswith('part-'):
+            count += 1
+            size += status.getLen()
+    return count, size
+
+
+def write_report(spark, args, df_result, output):
+    if args.output_mode == 'single':
+        df_result.coalesce(1) \
+            .write.parquet(output, mode='overwrite')
+        return
+
+    # One shuffle on the partition columns: every (service_type, revenue_month)
+    # is written by its own task, so the write keeps its parallelism and each
+    # directory gets whole files instead of one sliver per aggregate partition.
+    # The partition count is explicit because AQE (parallelismFirst=false)
+    # would otherwise coalesce a small month's shuffle into one or two tasks.
+    # maxRecordsPerFile splits large directories to the target file size.
+    partitions = int(spark.conf.get('spark.sql.shuffle.partitions'))
+    df_out = df_result \
+        .withColumn('revenue_month', F.to_date('revenue_month')) \
+        .repartition(partitions, 'service_type', 'revenue_month')
+
+    rows_per_file = max(1, args.target_file_mb * 1024 * 1024 // estimated_row_bytes(df_out.schema))
+
+    writer = df_out.write \
+        .partitionBy('service_type', 'revenue_month') \
+        .option('maxRecordsPerFile', rows_per_file) \
+        .mode('overwrite')
+
+    if args.incremental:
+        # Dynamic overwrite replaces only the partitions present in df_out and
+        # leaves every other month (and the state file) untouched
+        writer = writer.option('partitionOverwriteMode', 'dynamic')
+
+    if args.bucket_zones:
+        # bucketBy is only supported for tables; the data still lands in `output`
+        # (qualified, since a relative table path resolves against the warehouse)
+        fs, hadoop_path = hadoop_fs(spark, output)
+        table_name = hadoop_path.getName().replace('-', '_')
+        writer \
+            .bucketBy(args.bucket_zones, 'revenue_zone') \
+            .sortBy('revenue_zone') \
+            .option('path', fs.makeQualified(hadoop_path).toString()) \
+            .saveAsTable(table_name)
+    else:
+        writer.parquet(output)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    inputs = {'green': args.input_green, 'yellow': args.input_yellow}
+
+    # Without --reports (or --zones) the job keeps its original single-report layout
+    single_layout = args.reports is None and args.zones is None
+    reports = load_reports(args.reports or (['revenue', 'borough'] if args.zones else ['revenue']),
+                           zones=args.zones is not None)
+    outputs = {name: args.output if single_layout else f'{args.output.rstrip("/")}/{name}'
+               for name, _, _ in reports}
+    needed = set().union(*(columns for _, _, columns in reports))
+    if args.zones:
+        needed.add('PULocationID')
+    columns = [c for c in COMMON_COLUMNS if c in needed]
+
+    if args.engine == 'duckdb':
+        import duckdb_engine  # only this path needs duckdb installed
+        duckdb_engine.run(args, reports, outputs, columns)
+        return
+
+    spark = create_session('test', args.profile)
+
+    if args.incremental:
+        df_trips_data, affected_partitions, new_state = incremental_trips(spark, args, inputs, columns)
+        if df_trips_data is None:
+            if not args.explain:
+                for output in outputs.values():
+                    drop_partitions(spark, output, affected_partitions)
+                write_state(spark, args.state_file, new_state)
+            print('incremental: nothing to recompute' if not affected_partitions else
+                  'incremental: no input rows left for the changed months')
+            spark.stop()
+            return
+    else:
+        df_trips_data = build_trips(
+            spark,
+            {service: [pattern] for service, pattern in inputs.items()},
+            columns,
+            args.start_date,
+            args.end_date)
+
+    if args.zones:
+        # The lookup goes to every task; the trips stay in their scan
+        # partitions until the reports aggregate them
+        df_trips_data = with_pickup_zones(df_trips_data, read_zones(spark, args.zones))
+        check_no_trips_shuffle(df_trips_data)
+        print('zones: broadcast join, trips not shuffled')
+
+    persisted = len(reports) > 1 and args.storage_level != 'NONE' and not args.explain
+    if persisted:
+        # Scan and union the inputs once; every report then reads the cache
+        cache_start = time.time()
+        df_trips_data = df_trips_data.persist(getattr(StorageLevel, args.storage_level))
+        cached_rows = df_trips_data.count()
+        print(f'trips_data: {cached_rows} rows persisted ({args.storage_level}) '
+              f'in {time.time() - cache_start:.1f}s')
+
+    df_trips_data.createOrReplaceTempView('trips_data')
+
+    results = [(name, spark.sql(sql)) for name, sql, _ in reports]
+
+    if args.explain:
+        for name, df_result in results:
+            # The Scan parquet nodes list the columns read (ReadSchema) and the
+            # pickup range handed to the reader (PushedFilters)
+            print(f'== report: {name} ==')
+            df_result.explain(mode='formatted')
+        spark.stop()
+        return
+
+    if args.output_mode == 'partitioned':
+        for name, df_result in results:
+            if not {'service_type', 'revenue_month'} <= set(df_result.columns):
+                raise SystemExit(f'report {name!r} must return service_type and revenue_month '
+                                 f'to be written with --output_mode partitioned')
+
+    for name, df_result in results:
+        output = outputs[name]
+        write_start = time.time()
+
+        if args.incremental:
+            # The written months are collected after the write; keep the
+            # aggregate so that second action does not recompute it
+            df_result = df_result.persist(StorageLevel.MEMORY_AND_DISK)
+
+        write_report(spark, args, df_result, output)
+
+        if args.incremental:
+            written = {(row.service_type, row.month) for row in df_result
+                       .select('service_type', F.date_format('revenue_month', 'yyyy-MM-dd').alias('month'))
+                       .distinct().collect()}
+            df_result.unpersist()
+            drop_partitions(spark, output, affected_partitions - written)
+
+        write_seconds = time.time() - write_start
+        file_count, total_bytes = count_output_files(spark, output)
+        print(f'{name} write ({args.output_mode}): {write_seconds:.1f}s, '
+              f'{file_count} file(s), {total_bytes / 1024 / 1024:.1f} MB')
+
+    if args.incremental:
+        write_state(spark, args.state_file, new_state)
+
+    if persisted:
+        df_trips_data.unpersist()
+
+    print_job_summary(spark, args.profile)
+
+
+if __name__ == '__main__':
+    main()
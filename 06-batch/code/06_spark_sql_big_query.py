@@ -3,16 +3,17 @@
 
 import argparse
 
-import pyspark
-from pyspark.sql import SparkSession
 from pyspark.sql import functions as F
 
+from spark_session import add_profile_argument, create_session, print_job_summary
+
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument('--input_green', required=True)
 parser.add_argument('--input_yellow', required=True)
 parser.add_argument('--output', required=True)
+add_profile_argument(parser)
 
 args = parser.parse_args()
 
@@ -21,9 +22,7 @@ input_yellow = args.input_yellow
 output = args.output
 
 
-spark = SparkSession.builder \
-    .appName('test') \
-    .getOrCreate()
+spark = create_session('test', args.profile)
 
 spark.conf.set('temporaryGcsBucket', 'dataproc-temp-europe-west6-828225226997-fckhkym8')
 
@@ -108,6 +107,8 @@ GROUP BY
 df_result.write.format('bigquery') \
     .option('table', output) \
     .save()
+
+print_job_summary(spark, args.profile)
     
 
 
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+DuckDB engine for the 06_spark_sql.py reports (`--engine duckdb`).
+
+Builds the same trips_data union as trips_data.build_trips() - same columns,
+compact types, pickup range and optional pickup zones - as a DuckDB view
+over the Parquet inputs and runs the same report SQL against it in-process.
+For a month or a year of trips this finishes before Spark has started its
+JVM. Output follows the Spark job: a directory of Parquet files, or
+service_type=/revenue_month= partitions.
+
+Inputs and outputs must be local paths. A directory matched by an input glob
+stands for every data file below it (names starting with _ or . skipped).
+"""
+
+import glob
+import os
+import shutil
+import time
+
+import duckdb
+
+from trips_data import COMPACT_TYPES, SERVICES, ZONE_COLUMNS
+
+
+def expand_inputs(pattern):
+    files = []
+    for match in sorted(glob.glob(pattern)):
+        if os.path.isdir(match):
+            for root, dirs, names in os.walk(match):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(('_', '.')))
+                files += [os.path.join(root, n) for n in sorted(names) if not n.startswith(('_', '.'))]
+        elif not os.path.basename(match).startswith(('_', '.')):
+            files.append(match)
+    if not files:
+        raise SystemExit(f'no input files match {pattern!r} (the duckdb engine reads local paths only)')
+    return files
+
+
+def quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def service_sql(files, service, columns, start=None, end=None):
+    names = SERVICES[service]
+    physical = {'pickup_datetime': names['pickup'], 'dropoff_datetime': names['dropoff']}
+
+    selected = []
+    for column in columns:
+        expr = f'"{physical.get(column, column)}"'
+        if column in COMPACT_TYPES:
+            expr = f'CAST({expr} AS {COMPACT_TYPES[column].upper()})'
+        selected.append(f'{expr} AS "{column}"')
+
+    filters = []
+    if start:
+        filters.append(f'"{names["pickup"]}" >= TIMESTAMP {quote(start)}')
+    if end:
+        filters.append(f'"{names["pickup"]}" < TIMESTAMP {quote(end)}')
+
+    return (f'SELECT {", ".join(selected)}, {quote(service)} AS service_type\n'
+            f'FROM read_parquet([{", ".join(quote(f) for f in files)}], union_by_name = true)'
+            + (f'\nWHERE {" AND ".join(filters)}' if filters else ''))
+
+
+def create_trips_view(con, inputs, columns, start=None, end=None, zones=None):
+    """`inputs` maps service -> input glob, as given to 06_spark_sql.py."""
+    trips = '\nUNION ALL BY NAME\n'.join(
+        service_sql(expand_inputs(pattern), service, columns, start, end)
+        for service, pattern in inputs.items())
+
+    if zones:
+        zone_columns = ', '.join(f"'{name}': '{kind.upper()}'" for name, kind in ZONE_COLUMNS.items())
+        trips = f"""
+SELECT t.*,
+    z.Borough AS pickup_borough,
+    z.Zone AS pickup_zone,
+    z.service_zone AS pickup_service_zone
+FROM ({trips}) t
+LEFT JOIN read_csv({quote(zones)}, header = true, columns = {{{zone_columns}}}) z
+    ON t.PULocationID = z.LocationID"""
+
+    con.execute(f'CREATE OR REPLACE VIEW trips_data AS {trips}')
+
+
+def count_output_files(path):
+    count, size = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name.endswith('.parquet'):
+                count += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return count, size
+
+
+def write_report(con, sql, output, output_mode):
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    if output_mode == 'single':
+        con.execute(f"COPY ({sql}) TO {quote(os.path.join(output, 'part-00000.parquet'))} (FORMAT parquet)")
+        return
+
+    # Same directory layout as the Spark job, revenue_month as a date. DuckDB
+    # cannot split partitions by size, so --target_file_mb does not apply.
+    con.execute(f"""
+COPY (SELECT * REPLACE (CAST(revenue_month AS DATE) AS revenue_month) FROM ({sql}))
+TO {quote(output)}
+(FORMAT parquet, PARTITION_BY (service_type, revenue_month))""")
+
+
+def run(args, reports, outputs, columns):
+    """Compute `reports` ([(name, sql, columns)]) into `outputs` ({name: path})."""
+    con = duckdb.connect()
+    create_trips_view(
+        con,
+        {'green': args.input_green, 'yellow': args.input_yellow},
+        columns,
+        args.start_date,
+        args.end_date,
+        args.zones)
+
+    if args.explain:
+        for name, sql, _ in reports:
+            print(f'== report: {name} ==')
+            print(con.execute(f'EXPLAIN {sql}').fetchall()[0][1])
+        con.close()
+        return
+
+    if args.output_mode == 'partitioned':
+        for name, sql, _ in reports:
+            result_columns = [d[0] for d in con.execute(f'DESCRIBE {sql}').fetchall()]
+            if not {'service_type', 'revenue_month'} <= set(result_columns):
+                raise SystemExit(f'report {name!r} must return service_type and revenue_month '
+                                 f'to be written with --output_mode partitioned')
+
+    for name, sql, _ in reports:
+        output = outputs[name]
+        write_start = time.time()
+
+        write_report(con, sql, output, args.output_mode)
+
+        write_seconds = time.time() - write_start
+        file_count, total_bytes = count_output_files(output)
+        print(f'{name} write ({args.output_mode}, duckdb): {write_seconds:.1f}s, '
+              f'{file_count} file(s), {total_bytes / 1024 / 1024:.1f} MB')
+
+    con.close()
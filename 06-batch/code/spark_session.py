@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+SparkSession factory with named performance profiles for the 06-batch jobs.
+
+Every profile turns on adaptive query execution (partition coalescing and
+skew-join splitting), Arrow for pandas conversions and the Kryo serializer;
+they differ in how many shuffle partitions they start from and how large a
+partition AQE aims for. Jobs add `--profile` with add_profile_argument(),
+build the session with create_session() and call print_job_summary() at the
+end. On Dataproc ship it alongside the job with `--py-files spark_session.py`.
+"""
+
+import json
+import urllib.request
+
+
+COMMON_CONF = {
+    'spark.sql.adaptive.enabled': 'true',
+    'spark.sql.adaptive.coalescePartitions.enabled': 'true',
+    # Coalesce to the advisory size rather than to the default parallelism
+    'spark.sql.adaptive.coalescePartitions.parallelismFirst': 'false',
+    'spark.sql.adaptive.skewJoin.enabled': 'true',
+    'spark.sql.execution.arrow.pyspark.enabled': 'true',
+    'spark.sql.execution.arrow.pyspark.fallback.enabled': 'true',
+    'spark.serializer': 'org.apache.spark.serializer.KryoSerializer',
+}
+
+PROFILES = {
+    # A laptop or a single VM: a handful of cores, a few million rows
+    'local': {
+        'spark.sql.shuffle.partitions': '16',
+        'spark.sql.adaptive.advisoryPartitionSizeInBytes': '16m',
+        'spark.sql.adaptive.skewJoin.skewedPartitionThresholdInBytes': '64m',
+    },
+    # The course cluster: 1 master + 2 workers, a year or two of trips
+    'dataproc-small': {
+        'spark.sql.shuffle.partitions': '64',
+        'spark.sql.adaptive.advisoryPartitionSizeInBytes': '64m',
+        'spark.sql.adaptive.skewJoin.skewedPartitionThresholdInBytes': '256m',
+    },
+    # Tens of workers, the full TLC history
+    'dataproc-large': {
+        'spark.sql.shuffle.partitions': '400',
+        'spark.sql.adaptive.advisoryPartitionSizeInBytes': '128m',
+        'spark.sql.adaptive.skewJoin.skewedPartitionThresholdInBytes': '512m',
+        'spark.sql.autoBroadcastJoinThreshold': '64m',
+    },
+}
+
+DEFAULT_PROFILE = 'local'
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help=f'Spark performance profile (default: {DEFAULT_PROFILE})')
+
+
+def profile_conf(profile):
+    return {**COMMON_CONF, **PROFILES[profile]}
+
+
+def create_session(app_name, profile=DEFAULT_PROFILE):
+    # Imported here, so jobs can parse their arguments (and run --engine duckdb)
+    # without pyspark installed
+    from pyspark.sql import SparkSession
+
+    builder = SparkSession.builder.appName(app_name)
+    for key, value in profile_conf(profile).items():
+        builder = builder.config(key, value)
+    spark = builder.getOrCreate()
+    # Static settings (the serializer) are ignored when a session already
+    # existed; the SQL ones can still be applied
+    for key, value in profile_conf(profile).items():
+        if spark.conf.isModifiable(key):
+            spark.conf.set(key, value)
+    return spark
+
+
+def stage_metrics(spark):
+    """
+    Completed stages from the driver's monitoring REST API, oldest first.
+
+    Returns None when the UI (and with it the API) is disabled.
+    """
+    ui_url = spark.sparkContext.uiWebUrl
+    if not ui_url:
+        return None
+    app_id = spark.sparkContext.applicationId
+    with urllib.request.urlopen(f'{ui_url}/api/v1/applications/{app_id}/stages?status=complete',
+                                timeout=10) as resp:
+        stages = json.load(resp)
+    return sorted(stages, key=lambda s: (s['stageId'], s['attemptId']))
+
+
+def print_job_summary(spark, profile):
+    """Print the effective profile settings and per-stage metrics of the job so far."""
+    print(f'spark profile: {profile}')
+    for key in profile_conf(profile):
+        print(f'  {key} = {spark.conf.get(key, None)}')
+
+    try:
+        stages = stage_metrics(spark)
+    except OSError as e:
+        print(f'stage metrics unavailable: {e}')
+        return
+    if stages is None:
+        print('stage metrics unavailable: spark.ui.enabled is false')
+        return
+
+    mb = 1024 * 1024
+    print(f'{"stage":>5} {"tasks":>6} {"run s":>7} {"input MB":>9} {"shuffle r MB":>12} '
+          f'{"shuffle w MB":>12} {"spill MB":>9}  name')
+    for s in stages:
+        spill = s.get('memoryBytesSpilled', 0) + s.get('diskBytesSpilled', 0)
+        print(f'{s["stageId"]:>5} {s["numTasks"]:>6} {s["executorRunTime"] / 1000:>7.1f} '
+              f'{s["inputBytes"] / mb:>9.1f} {s["shuffleReadBytes"] / mb:>12.1f} '
+              f'{s["shuffleWriteBytes"] / mb:>12.1f} {spill / mb:>9.1f}  {s["name"][:40]}')
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Unified green + yellow trips DataFrame for the 06-batch Spark jobs.
+
+Each service is read with only the requested columns, the pickup-date range
+is applied to the file's own column (so Spark pushes it into the Parquet
+scan and skips row groups), and small integer columns are cast to compact
+types before anything is shuffled. Pickup zones can be attached from the
+taxi zone lookup with a broadcast join, which leaves the trips where they
+are. Jobs import it directly when run locally; on Dataproc ship it alongside
+the job with `--py-files trips_data.py`.
+"""
+
+from functools import reduce
+
+# Optional, so the DuckDB engine (duckdb_engine.py) can use the column
+# definitions below where pyspark is not installed
+try:
+    from pyspark.sql import functions as F
+except ImportError:
+    F = None
+
+
+SERVICES = {
+    'green': {'pickup': 'lpep_pickup_datetime', 'dropoff': 'lpep_dropoff_datetime'},
+    'yellow': {'pickup': 'tpep_pickup_datetime', 'dropoff': 'tpep_dropoff_datetime'},
+}
+
+COMMON_COLUMNS = [
+    'VendorID',
+    'pickup_datetime',
+    'dropoff_datetime',
+    'store_and_fwd_flag',
+    'RatecodeID',
+    'PULocationID',
+    'DOLocationID',
+    'passenger_count',
+    'trip_distance',
+    'fare_amount',
+    'extra',
+    'mta_tax',
+    'tip_amount',
+    'tolls_amount',
+    'improvement_surcharge',
+    'total_amount',
+    'payment_type',
+    'congestion_surcharge'
+]
+
+# Columns the monthly revenue report reads
+REVENUE_COLUMNS = [
+    'pickup_datetime',
+    'PULocationID',
+    'passenger_count',
+    'trip_distance',
+    'fare_amount',
+    'extra',
+    'mta_tax',
+    'tip_amount',
+    'tolls_amount',
+    'improvement_surcharge',
+    'total_amount',
+    'congestion_surcharge'
+]
+
+# taxi_zone_lookup.csv (01-docker-terraform or the dbt seed; the header
+# spelling differs, so the names come from here)
+ZONE_COLUMNS = {
+    'LocationID': 'int',
+    'Borough': 'string',
+    'Zone': 'string',
+    'service_zone': 'string',
+}
+ZONE_SCHEMA = ', '.join(f'{name} {kind}' for name, kind in ZONE_COLUMNS.items())
+
+# TLC ids, codes and counts all fit in 16 bits (zones go up to 265);
+# amounts and distances stay double
+COMPACT_TYPES = {
+    'VendorID': 'smallint',
+    'RatecodeID': 'smallint',
+    'PULocationID': 'smallint',
+    'DOLocationID': 'smallint',
+    'passenger_count': 'smallint',
+    'payment_type': 'smallint',
+}
+
+
+def read_trips(spark, paths, service, columns=COMMON_COLUMNS, start=None, end=None):
+    """
+    Read one service's Parquet files as the unified trips schema plus `service_type`.
+
+    `start` / `end` ('YYYY-MM-DD', end exclusive) bound pickup_datetime.
+    """
+    names = SERVICES[service]
+    physical = {'pickup_datetime': names['pickup'], 'dropoff_datetime': names['dropoff']}
+
+    df = spark.read.parquet(*paths)
+
+    # Filter before renaming, on the column as stored, so it shows up under
+    # PushedFilters in the scan rather than as a Filter above it
+    if start:
+        df = df.filter(F.col(names['pickup']) >= F.lit(start))
+    if end:
+        df = df.filter(F.col(names['pickup']) < F.lit(end))
+
+    selected = []
+    for column in columns:
+        col = F.col(physical.get(column, column))
+        if column in COMPACT_TYPES:
+            col = col.cast(COMPACT_TYPES[column])
+        selected.append(col.alias(column))
+
+    return df.select(*selected, F.lit(service).alias('service_type'))
+
+
+def build_trips(spark, inputs, columns=COMMON_COLUMNS, start=None, end=None):
+    """
+    Union the services in `inputs` ({'green': [paths], 'yellow': [paths]}).
+
+    Services without paths are skipped; columns are matched by name.
+    """
+    frames = [
+        read_trips(spark, paths, service, columns, start, end)
+        for service, paths in inputs.items()
+        if paths
+    ]
+    if not frames:
+        raise ValueError('build_trips needs at least one input path')
+    return reduce(lambda left, right: left.unionByName(right), frames)
+
+
+def read_zones(spark, path):
+    """The 265-row zone lookup as pickup_* columns keyed by PULocationID."""
+    return spark.read \
+        .option('header', 'true') \
+        .schema(ZONE_SCHEMA) \
+        .csv(path) \
+        .select(
+            F.col('LocationID').cast(COMPACT_TYPES['PULocationID']).alias('PULocationID'),
+            F.col('Borough').alias('pickup_borough'),
+            F.col('Zone').alias('pickup_zone'),
+            F.col('service_zone').alias('pickup_service_zone'))
+
+
+def with_pickup_zones(df_trips, df_zones):
+    """
+    Add pickup_borough / pickup_zone / pickup_service_zone to every trip.
+
+    The lookup is broadcast, so each trips partition is joined where it was
+    read; trips whose zone is missing from the lookup are kept with nulls.
+    """
+    return df_trips.join(F.broadcast(df_zones), on='PULocationID', how='left')
+
+
+def check_no_trips_shuffle(df):
+    """
+    Raise if the plan of an enriched (not yet aggregated) frame is not a
+    broadcast join or moves the trips through a shuffle exchange.
+    """
+    plan = df._jdf.queryExecution().executedPlan().toString()
+    if 'BroadcastHashJoin' not in plan:
+        raise RuntimeError(f'zone lookup is not broadcast:\n{plan}')
+    shuffles = [line.strip() for line in plan.splitlines()
+                if 'Exchange' in line and 'BroadcastExchange' not in line]
+    if shuffles:
+        raise RuntimeError('trips are shuffled before the zone join: ' + '; '.join(shuffles))
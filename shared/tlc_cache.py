@@ -0,0 +1,290 @@
+"""
+Local download cache for NYC TLC trip files
+===========================================
+Shared by every ingestion entry point in this repo (ingest_data.py,
+ny_taxi_to_gcs.py, load_yellow_taxi_data.py and the Bruin trips asset) so a
+file is downloaded once per machine, however many scripts read it.
+
+Layout under the cache directory (TLC_CACHE_DIR, default ~/.cache/tlc):
+
+  index/<sha256(url)>.json   url, ETag, Last-Modified, size, sha256, last access
+  blobs/<sha256(content)>    file bytes, content-addressed
+  tmp/                       in-flight downloads
+  locks/                     per-URL locks so concurrent fetches download once,
+                             plus evict.lock so one process evicts at a time
+
+A download is written to tmp/<sha256(url)>.part, checked against its
+expected length, hashed, and only then renamed into blobs/ and recorded in
+the index. A run killed half-way leaves only the .part file, which is never
+mistaken for a complete download; a resuming downloader can pick it up and
+stale ones are removed after a day. Once the total size exceeds the cap
+(TLC_CACHE_MAX_BYTES, default 20 GiB) the least recently used entries are
+evicted.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import urllib.request
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, downloads may overlap
+    fcntl = None
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tlc")
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+READ_BLOCK_SIZE   = 1024 * 1024
+STALE_TMP_SECONDS = 24 * 60 * 60
+# materialize() re-fetches when another process evicts the blob under it
+MATERIALIZE_ATTEMPTS = 3
+
+
+class DownloadCache:
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = None):
+        self.cache_dir = cache_dir or os.environ.get("TLC_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or int(os.environ.get("TLC_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        for sub in ("index", "blobs", "tmp", "locks"):
+            os.makedirs(os.path.join(self.cache_dir, sub), exist_ok=True)
+
+    # ── paths ────────────────────────────────────────────────────────────
+    @staticmethod
+    def url_key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "index", f"{key}.json")
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", sha256)
+
+    # ── index ────────────────────────────────────────────────────────────
+    def _read_entry(self, key: str) -> dict | None:
+        try:
+            with open(self._index_path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_entry(self, key: str, entry: dict) -> None:
+        self._atomic_write(self._index_path(key), json.dumps(entry, indent=2).encode("utf-8"))
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.cache_dir, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def lookup(self, url: str) -> str | None:
+        """Return the cached path for `url` if a complete copy is present, else None."""
+        entry = self._read_entry(self.url_key(url))
+        if entry is None:
+            return None
+        path = self._blob_path(entry["sha256"])
+        try:
+            if os.path.getsize(path) != entry["size"]:
+                return None
+        except FileNotFoundError:
+            return None
+        entry["last_access"] = time.time()
+        self._write_entry(self.url_key(url), entry)
+        return path
+
+    @contextmanager
+    def _lock(self, key: str):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, "locks", f"{key}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ── fetch ────────────────────────────────────────────────────────────
+    def fetch(self, url: str, timeout: float = 60, downloader=None) -> str:
+        """
+        Return a local path holding the complete contents of `url`.
+
+        Cache hits cost no network traffic. HTTP errors (e.g. a 404 for a month
+        TLC has not published yet) propagate as urllib.error.HTTPError.
+
+        `downloader(url, part_path)` can replace the built-in single-stream
+        download. It must leave the complete file at `part_path` and return a
+        dict with "size" and optionally "etag" / "last_modified". The part path
+        is stable per URL and survives failures, so a downloader may resume it.
+        """
+        key = self.url_key(url)
+        path = self.lookup(url)
+        if path:
+            return path
+
+        with self._lock(key):
+            # Another process may have finished the download while we waited
+            path = self.lookup(url)
+            if path:
+                return path
+            path = self._download(url, key, timeout, downloader)
+
+        self.evict(keep=key)
+        return path
+
+    def part_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, "tmp", f"{self.url_key(url)}.part")
+
+    def _stream(self, url: str, part: str, timeout: float) -> dict:
+        """Built-in downloader: one GET, written from the start."""
+        received = 0
+        with urllib.request.urlopen(url, timeout=timeout) as resp, open(part, "wb") as out:
+            meta = {
+                "size": int(resp.headers["Content-Length"]) if resp.headers.get("Content-Length") else None,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+            }
+            while block := resp.read(READ_BLOCK_SIZE):
+                out.write(block)
+                received += len(block)
+        if meta["size"] is None:
+            meta["size"] = received
+        return meta
+
+    def _download(self, url: str, key: str, timeout: float, downloader=None) -> str:
+        part = self.part_path(url)
+        meta = downloader(url, part) if downloader else self._stream(url, part, timeout)
+
+        received = os.path.getsize(part)
+        if received != meta["size"]:
+            raise IOError(f"Truncated download of {url}: got {received} of {meta['size']} bytes")
+
+        digest = hashlib.sha256()
+        with open(part, "rb") as f:
+            while block := f.read(READ_BLOCK_SIZE):
+                digest.update(block)
+            os.fsync(f.fileno())
+        sha256 = digest.hexdigest()
+        blob = self._blob_path(sha256)
+        os.replace(part, blob)
+
+        now = time.time()
+        self._write_entry(key, {
+            "url": url,
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+            "size": received,
+            "sha256": sha256,
+            "created": now,
+            "last_access": now,
+        })
+        return blob
+
+    def materialize(self, url: str, dest: str, timeout: float = 60, downloader=None) -> str:
+        """
+        Fetch `url` through the cache and expose it at `dest`.
+
+        `dest` is a hard link to the cached blob when possible (a copy otherwise),
+        created under a temporary name and renamed into place, so callers that
+        delete `dest` afterwards never touch the cache. If another process
+        evicts the blob between fetch() and the link, it is fetched again.
+        """
+        dest_dir = os.path.dirname(os.path.abspath(dest))
+        fd, tmp = tempfile.mkstemp(dir=dest_dir, prefix=".", suffix=".part")
+        os.close(fd)
+        os.remove(tmp)
+        try:
+            for attempt in range(MATERIALIZE_ATTEMPTS):
+                blob = self.fetch(url, timeout=timeout, downloader=downloader)
+                try:
+                    self._link_or_copy(blob, tmp)
+                    break
+                except FileNotFoundError:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    if attempt == MATERIALIZE_ATTEMPTS - 1:
+                        raise
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return dest
+
+    @staticmethod
+    def _link_or_copy(blob: str, dest: str) -> None:
+        try:
+            os.link(blob, dest)
+        except FileNotFoundError:
+            raise  # the blob is gone, a copy would fail too
+        except OSError:
+            # e.g. dest on another filesystem
+            shutil.copyfile(blob, dest)
+
+    # ── eviction ─────────────────────────────────────────────────────────
+    def evict(self, keep: str | None = None) -> list[str]:
+        """
+        Drop least recently used entries until the cache fits in max_bytes.
+
+        The entry keyed `keep` (the one just fetched) is never evicted, even if
+        it alone exceeds the cap. Returns the evicted URLs.
+
+        Runs under a cache-wide lock so concurrent evictors do not pick the
+        same entries. Without fcntl an index file can still vanish under us;
+        whoever removed it has already accounted for it.
+        """
+        with self._lock("evict"):
+            self._clean_tmp()
+            entries = []
+            index_dir = os.path.join(self.cache_dir, "index")
+            for name in os.listdir(index_dir):
+                entry = self._read_entry(name.removesuffix(".json"))
+                if entry is not None:
+                    entries.append((name.removesuffix(".json"), entry))
+
+            # Blobs are shared by URLs with identical content; count each once
+            blob_refs: dict[str, int] = {}
+            total = 0
+            for _, entry in entries:
+                if entry["sha256"] not in blob_refs:
+                    total += entry["size"]
+                blob_refs[entry["sha256"]] = blob_refs.get(entry["sha256"], 0) + 1
+
+            evicted = []
+            for key, entry in sorted(entries, key=lambda e: e[1]["last_access"]):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                try:
+                    os.remove(self._index_path(key))
+                except FileNotFoundError:
+                    continue
+                blob_refs[entry["sha256"]] -= 1
+                if blob_refs[entry["sha256"]] == 0:
+                    try:
+                        os.remove(self._blob_path(entry["sha256"]))
+                    except FileNotFoundError:
+                        pass
+                    total -= entry["size"]
+                evicted.append(entry["url"])
+            return evicted
+
+    def _clean_tmp(self) -> None:
+        tmp_dir = os.path.join(self.cache_dir, "tmp")
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,110 @@
+"""
+Declared column types for NYC TLC trip files
+============================================
+Shared by ingest_data.py (Postgres load) and ny_taxi_to_gcs.py (--to-parquet),
+so both read every taxi type with the same types instead of inferring them.
+
+Types are logical names ("smallint", "integer", "double", "timestamp",
+"text"); each script maps them to its own pandas / Arrow / SQL types.
+Column names are as TLC publishes them; match them case-insensitively, since
+TLC has changed the casing between releases (e.g. Airport_fee / airport_fee).
+"""
+
+
+_TRIP_AMOUNTS = {
+    "fare_amount": "double",
+    "extra": "double",
+    "mta_tax": "double",
+    "tip_amount": "double",
+    "tolls_amount": "double",
+    "improvement_surcharge": "double",
+    "total_amount": "double",
+    "congestion_surcharge": "double",
+    "cbd_congestion_fee": "double",
+}
+
+TAXI_SCHEMAS = {
+    "yellow": {
+        "VendorID": "smallint",
+        "tpep_pickup_datetime": "timestamp",
+        "tpep_dropoff_datetime": "timestamp",
+        "passenger_count": "smallint",
+        "trip_distance": "double",
+        "RatecodeID": "smallint",
+        "store_and_fwd_flag": "text",
+        "PULocationID": "smallint",
+        "DOLocationID": "smallint",
+        "payment_type": "smallint",
+        **_TRIP_AMOUNTS,
+        "airport_fee": "double",
+    },
+    "green": {
+        "VendorID": "smallint",
+        "lpep_pickup_datetime": "timestamp",
+        "lpep_dropoff_datetime": "timestamp",
+        "store_and_fwd_flag": "text",
+        "RatecodeID": "smallint",
+        "PULocationID": "smallint",
+        "DOLocationID": "smallint",
+        "passenger_count": "smallint",
+        "trip_distance": "double",
+        **_TRIP_AMOUNTS,
+        "ehail_fee": "double",
+        "payment_type": "smallint",
+        "trip_type": "smallint",
+    },
+    "fhv": {
+        "dispatching_base_num": "text",
+        "pickup_datetime": "timestamp",
+        "dropOff_datetime": "timestamp",
+        "PUlocationID": "smallint",
+        "DOlocationID": "smallint",
+        "SR_Flag": "smallint",
+        "Affiliated_base_number": "text",
+    },
+    "fhvhv": {
+        "hvfhs_license_num": "text",
+        "dispatching_base_num": "text",
+        "originating_base_num": "text",
+        "request_datetime": "timestamp",
+        "on_scene_datetime": "timestamp",
+        "pickup_datetime": "timestamp",
+        "dropoff_datetime": "timestamp",
+        "PULocationID": "smallint",
+        "DOLocationID": "smallint",
+        "trip_miles": "double",
+        "trip_time": "integer",
+        "base_passenger_fare": "double",
+        "tolls": "double",
+        "bcf": "double",
+        "sales_tax": "double",
+        "congestion_surcharge": "double",
+        "airport_fee": "double",
+        "tips": "double",
+        "driver_pay": "double",
+        "cbd_congestion_fee": "double",
+        "shared_request_flag": "text",
+        "shared_match_flag": "text",
+        "access_a_ride_flag": "text",
+        "wav_request_flag": "text",
+        "wav_match_flag": "text",
+    },
+}
+
+
+def arrow_types(text=None) -> dict:
+    """
+    Arrow type per logical type; `text` overrides pa.string() (e.g. pa.large_string()).
+
+    pyarrow is imported here rather than at module level, so scripts that only
+    need TAXI_SCHEMAS do not need pyarrow installed.
+    """
+    import pyarrow as pa
+
+    return {
+        "smallint": pa.int16(),
+        "integer": pa.int32(),
+        "double": pa.float64(),
+        "timestamp": pa.timestamp("us"),
+        "text": text if text is not None else pa.string(),
+    }